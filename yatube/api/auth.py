@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core import signing
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.crypto import constant_time_compare
+
+from posts.models import User
+
+TOKEN_SALT = 'api.token'
+
+
+def issue_token(user):
+    """Подписанный токен для заголовка Authorization: Token <токен>.
+
+    В токене хеш пароля сессии: смена пароля отзывает все токены,
+    как и сессии браузера.
+    """
+    return signing.dumps(
+        [user.pk, user.get_session_auth_hash()], salt=TOKEN_SALT
+    )
+
+
+def token_user(header):
+    """Пользователь по значению заголовка Authorization или None."""
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'token' or not token.strip():
+        return None
+    try:
+        user_id, auth_hash = signing.loads(
+            token.strip(),
+            salt=TOKEN_SALT,
+            max_age=settings.API_TOKEN_MAX_AGE
+        )
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    user = User.objects.filter(pk=user_id, is_active=True).first()
+    if user is None or not constant_time_compare(
+        auth_hash, user.get_session_auth_hash()
+    ):
+        return None
+    return user
+
+
+def csrf_rejected(request):
+    """Проверка CSRF для запросов с cookie сессии.
+
+    View API освобождены от CsrfViewMiddleware ради клиентов
+    с токеном; браузер с сессией проверяется здесь так же строго.
+    """
+    return CsrfViewMiddleware().process_view(request, None, (), {})
@@ -0,0 +1,67 @@
+from django.core.files.storage import default_storage
+
+# Поле ответа -> выражение для values(). Сериализация идёт по словарям
+# из values(), без создания экземпляров моделей.
+POST_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'pub_date': 'pub_date',
+    'image': 'image',
+    'image_width': 'image_width',
+    'image_height': 'image_height',
+    'comment_count': 'comment_count',
+}
+
+COMMENT_FIELDS = {
+    'id': 'pk',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+
+GROUP_FIELDS = {
+    'title': 'title',
+    'slug': 'slug',
+    'description': 'description',
+}
+
+
+class FieldsError(ValueError):
+    """В ?fields= запрошено поле, которого нет в ресурсе."""
+
+
+def requested_fields(request, available):
+    """Поля из ?fields=a,b или все поля ресурса."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    fields = [field for field in raw.split(',') if field]
+    unknown = set(fields) - set(available)
+    if unknown:
+        raise FieldsError(
+            'Неизвестные поля: ' + ', '.join(sorted(unknown))
+        )
+    return fields
+
+
+def values(queryset, fields, available, date_field=None):
+    """values() только с нужными колонками и ключом курсора."""
+    lookups = {available[field] for field in fields}
+    if date_field is not None:
+        lookups |= {'pk', date_field}
+    if 'comment_count' in lookups:
+        queryset = queryset.with_comment_count()
+    return queryset.values(*lookups)
+
+
+def serialize(row, fields, available):
+    data = {}
+    for field in fields:
+        value = row[available[field]]
+        if field == 'image':
+            value = default_storage.url(value) if value else None
+        data[field] = value
+    return data
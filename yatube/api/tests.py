@@ -0,0 +1,198 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='someauthor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(settings.API_PAGE_SIZE + 1):
+            cls.post = Post.objects.create(
+                author=cls.author, text=f'Тестовый пост {i}', group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_posts_list_cursor_and_fields(self):
+        """Лента постов листается курсором и отдаёт только нужные поля"""
+        url = reverse('api:posts')
+        with self.assertNumQueries(1):
+            data = self.guest_client.get(url, {'fields': 'id,text'}).json()
+        self.assertEqual(len(data['results']), settings.API_PAGE_SIZE)
+        self.assertEqual(
+            data['results'][0], {'id': self.post.pk, 'text': self.post.text}
+        )
+        self.assertIsNone(data['previous'])
+        data = self.guest_client.get(data['next']).json()
+        self.assertEqual(data['results'], [
+            {'id': Post.objects.earliest('pub_date').pk,
+             'text': 'Тестовый пост 0'}
+        ])
+        self.assertIsNone(data['next'])
+        response = self.guest_client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_feeds_and_detail(self):
+        """Ленты группы, профиля и пост отдаются в JSON"""
+        urls = (
+            reverse('api:group_posts', kwargs={'slug': self.group.slug}),
+            reverse(
+                'api:profile_posts',
+                kwargs={'username': self.author.username}
+            ),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                post = self.guest_client.get(url).json()['results'][0]
+                self.assertEqual(post['author'], self.author.username)
+                self.assertEqual(post['group'], self.group.slug)
+                self.assertEqual(post['comment_count'], 0)
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertEqual(self.guest_client.get(url).json()['id'], self.post.pk)
+        url = reverse('api:post_detail', kwargs={'post_id': 0})
+        response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIn('detail', response.json())
+
+    def test_etag_not_modified(self):
+        """Повторный запрос с ETag получает 304, пока данные не менялись"""
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['comment_count'], 1)
+
+    def test_write_posts_and_comments(self):
+        """Запись доступна только авторизованным и только автору"""
+        url = reverse('api:posts')
+        response = self.guest_client.post(
+            url, {'text': 'Новый пост'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        response = self.authorized_client.post(
+            url,
+            {'text': 'Новый пост', 'group': self.group.slug},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(response.json()['group'], self.group.slug)
+        post_url = reverse(
+            'api:post_detail', kwargs={'post_id': response.json()['id']}
+        )
+        response = self.authorized_client.patch(
+            post_url, {'text': 'Исправленный'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.json()['text'], 'Исправленный')
+        self.assertEqual(response.json()['group'], self.group.slug)
+        for group in (self.group.pk, [self.group.slug], 'no-such-group'):
+            with self.subTest(group=group):
+                response = self.authorized_client.patch(
+                    post_url, {'group': group},
+                    content_type='application/json'
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+                self.assertIn('group', response.json()['errors'])
+        response = self.authorized_client.patch(
+            reverse('api:post_detail', kwargs={'post_id': self.post.pk}),
+            {'text': 'Чужой'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        url = reverse('api:post_comments', kwargs={'post_id': self.post.pk})
+        response = self.authorized_client.post(
+            url, {'text': ''}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.authorized_client.post(
+            url, {'text': 'Комментарий'}, content_type='application/json'
+        )
+        comments = self.guest_client.get(url).json()['results']
+        self.assertEqual(comments[0]['author'], self.user.username)
+
+    def test_token_auth(self):
+        """Клиент без cookie пишет с токеном из api:token"""
+        User.objects.create_user(username='mobile', password='secret-pass')
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('api:token')
+        response = client.post(
+            url, {'username': 'mobile', 'password': 'wrong'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        token = client.post(
+            url, {'username': 'mobile', 'password': 'secret-pass'},
+            content_type='application/json'
+        ).json()['token']
+        response = client.post(
+            reverse('api:posts'), {'text': 'С телефона'},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {token}'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(response.json()['author'], 'mobile')
+        response = client.post(
+            reverse('api:posts'), {'text': 'С телефона'},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {token}x'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_session_requires_csrf(self):
+        """Запись с cookie сессии требует CSRF-токен из cookie csrftoken"""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        url = reverse('api:posts')
+        response = client.post(
+            url, {'text': 'Без CSRF'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        client.get(reverse('posts:post_create'))
+        response = client.post(
+            url, {'text': 'С CSRF'}, content_type='application/json',
+            HTTP_X_CSRFTOKEN=client.cookies[settings.CSRF_COOKIE_NAME].value
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+
+    def test_follow(self):
+        """Подписка и отписка через API"""
+        url = reverse(
+            'api:profile_follow', kwargs={'username': self.author.username}
+        )
+        response = self.authorized_client.post(url)
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertTrue(Follow.objects.filter(
+            user=self.user, author=self.author
+        ).exists())
+        self.authorized_client.delete(url)
+        self.assertFalse(Follow.objects.exists())
+        response = self.authorized_client.get(url)
+        self.assertEqual(
+            response.status_code, HTTPStatus.METHOD_NOT_ALLOWED
+        )
@@ -0,0 +1,263 @@
+import json
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.contrib.auth.forms import AuthenticationForm
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+
+from core.db_router import reads_replica
+from posts import page_cache
+from posts.forms import CommentForm, PostForm
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginator import CursorPaginator
+
+from .auth import csrf_rejected, issue_token, token_user
+from .serializers import (
+    COMMENT_FIELDS, GROUP_FIELDS, POST_FIELDS, FieldsError, requested_fields,
+    serialize, values
+)
+
+
+def error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def authenticate(request):
+    """Пользователь по токену или по сессии с проверкой CSRF.
+
+    Возвращает ответ-отказ или None.
+    """
+    header = request.META.get('HTTP_AUTHORIZATION')
+    if header:
+        user = token_user(header)
+        if user is None:
+            return error(HTTPStatus.UNAUTHORIZED, 'Неверный токен.')
+        request.user = user
+        return None
+    if not request.user.is_authenticated:
+        return error(HTTPStatus.UNAUTHORIZED, 'Требуется авторизация.')
+    if csrf_rejected(request) is not None:
+        return error(HTTPStatus.FORBIDDEN, 'Ошибка проверки CSRF.')
+    return None
+
+
+def parse_body(request):
+    """Кладёт JSON-тело в request.data; при ошибке возвращает ответ."""
+    request.data = {}
+    if request.content_type != 'application/json':
+        return None
+    try:
+        request.data = json.loads(request.body or b'{}')
+    except ValueError:
+        return error(HTTPStatus.BAD_REQUEST, 'Тело не JSON.')
+    if not isinstance(request.data, dict):
+        return error(HTTPStatus.BAD_REQUEST, 'Ожидается JSON-объект.')
+    return None
+
+
+def api_view(methods, scopes=None):
+    """Обёртка JSON-view: методы, вход, разбор тела и ошибки в JSON.
+
+    Для scopes ответы на GET получают ETag из версий page_cache,
+    и повторный запрос с If-None-Match стоит одного чтения кеша.
+    Запись требует заголовка Authorization: Token <токен> или сессии
+    с CSRF-токеном.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return error(
+                    HTTPStatus.METHOD_NOT_ALLOWED, 'Метод не разрешён.'
+                )
+            if request.method not in ('GET', 'HEAD'):
+                rejected = authenticate(request) or parse_body(request)
+                if rejected is not None:
+                    return rejected
+            try:
+                return view(request, *args, **kwargs)
+            except Http404:
+                return error(HTTPStatus.NOT_FOUND, 'Не найдено.')
+            except FieldsError as exc:
+                return error(HTTPStatus.BAD_REQUEST, str(exc))
+        if scopes is not None:
+            wrapper = condition(etag_func=page_cache.etag(scopes))(wrapper)
+        return csrf_exempt(reads_replica(wrapper))
+    return decorator
+
+
+def form_errors(form):
+    return JsonResponse(
+        {'detail': 'Ошибка в данных.', 'errors': form.errors},
+        status=HTTPStatus.BAD_REQUEST
+    )
+
+
+def paginated(request, queryset, available, date_field, ascending=False):
+    """Страница из values() с курсорами на соседние страницы."""
+    fields = requested_fields(request, available)
+    paginator = CursorPaginator(
+        values(queryset, fields, available, date_field),
+        settings.API_PAGE_SIZE,
+        date_field=date_field,
+        ascending=ascending
+    )
+    page = paginator.cursor_page(request.GET.get('cursor'))
+
+    def link(cursor):
+        if cursor is None:
+            return None
+        query = request.GET.copy()
+        query['cursor'] = cursor
+        return request.build_absolute_uri(
+            f'{request.path}?{query.urlencode()}'
+        )
+
+    return JsonResponse({
+        'results': [serialize(row, fields, available) for row in page],
+        'next': link(page.next_cursor),
+        'previous': link(page.previous_cursor),
+    })
+
+
+def post_form(request, instance=None):
+    """PostForm по JSON: группа передаётся slug и проверяется формой."""
+    data = {
+        'text': instance.text if instance else '',
+        'group': instance.group.slug if instance and instance.group else None,
+        **request.data,
+    }
+    form = PostForm(data, instance=instance)
+    form.fields['group'].to_field_name = 'slug'
+    return form
+
+
+def post_response(post_id, status=HTTPStatus.OK):
+    row = values(
+        Post.objects.filter(pk=post_id), POST_FIELDS, POST_FIELDS
+    ).get()
+    return JsonResponse(
+        serialize(row, POST_FIELDS, POST_FIELDS), status=status
+    )
+
+
+@csrf_exempt
+def token(request):
+    """Обменивает имя и пароль из JSON на токен для Authorization."""
+    if request.method != 'POST':
+        return error(HTTPStatus.METHOD_NOT_ALLOWED, 'Метод не разрешён.')
+    rejected = parse_body(request)
+    if rejected is not None:
+        return rejected
+    form = AuthenticationForm(request, data=request.data)
+    if not form.is_valid():
+        return form_errors(form)
+    return JsonResponse({'token': issue_token(form.get_user())})
+
+
+@api_view(('GET', 'HEAD', 'POST'), lambda: ['index'])
+def posts(request):
+    if request.method == 'POST':
+        form = post_form(request)
+        if not form.is_valid():
+            return form_errors(form)
+        post = form.save(commit=False)
+        post.author = request.user
+        post.save()
+        return post_response(post.pk, HTTPStatus.CREATED)
+    return paginated(request, Post.objects.all(), POST_FIELDS, 'pub_date')
+
+
+@api_view(('GET', 'HEAD', 'PATCH'), lambda post_id: [f'post:{post_id}'])
+def post_detail(request, post_id):
+    if request.method == 'PATCH':
+        post = get_object_or_404(Post, pk=post_id)
+        if post.author_id != request.user.pk:
+            return error(HTTPStatus.FORBIDDEN, 'Пост другого автора.')
+        form = post_form(request, post)
+        if not form.is_valid():
+            return form_errors(form)
+        form.save()
+        return post_response(post_id)
+    fields = requested_fields(request, POST_FIELDS)
+    row = values(
+        Post.objects.filter(pk=post_id), fields, POST_FIELDS
+    ).first()
+    if row is None:
+        raise Http404
+    return JsonResponse(serialize(row, fields, POST_FIELDS))
+
+
+@api_view(('GET', 'HEAD', 'POST'), lambda post_id: [f'post:{post_id}'])
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    if request.method == 'POST':
+        form = CommentForm(request.data)
+        if not form.is_valid():
+            return form_errors(form)
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post = post
+        comment.save()
+        row = values(
+            Comment.objects.filter(pk=comment.pk),
+            COMMENT_FIELDS,
+            COMMENT_FIELDS
+        ).get()
+        return JsonResponse(
+            serialize(row, COMMENT_FIELDS, COMMENT_FIELDS),
+            status=HTTPStatus.CREATED
+        )
+    return paginated(
+        request,
+        Comment.objects.filter(post=post),
+        COMMENT_FIELDS,
+        'created',
+        ascending=True
+    )
+
+
+@api_view(('GET', 'HEAD'), lambda: ['groups'])
+def groups(request):
+    fields = requested_fields(request, GROUP_FIELDS)
+    rows = values(Group.objects.order_by('title'), fields, GROUP_FIELDS)
+    return JsonResponse({
+        'results': [serialize(row, fields, GROUP_FIELDS) for row in rows],
+    })
+
+
+@api_view(('GET', 'HEAD'), lambda slug: [f'group:{slug}'])
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return paginated(
+        request, Post.objects.filter(group=group), POST_FIELDS, 'pub_date'
+    )
+
+
+@api_view(('GET', 'HEAD'), lambda username: [f'profile:{username}'])
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return paginated(
+        request, Post.objects.filter(author=author), POST_FIELDS, 'pub_date'
+    )
+
+
+@api_view(('POST', 'DELETE'))
+def profile_follow(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    if request.method == 'DELETE':
+        Follow.objects.filter(user=request.user, author=author).delete()
+        return JsonResponse({'following': False})
+    if author.pk == request.user.pk:
+        return error(HTTPStatus.BAD_REQUEST, 'Нельзя подписаться на себя.')
+    _, created = Follow.objects.get_or_create(
+        user=request.user, author=author
+    )
+    return JsonResponse(
+        {'following': True},
+        status=HTTPStatus.CREATED if created else HTTPStatus.OK
+    )
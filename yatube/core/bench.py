@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+
+
+def manage_command(*arguments):
+    """Командная строка manage.py с тем же интерпретатором."""
+    return [
+        sys.executable,
+        os.path.join(settings.BASE_DIR, 'manage.py'),
+        *arguments,
+    ]
+
+
+def environment(directory, profile=None, **env):
+    """Окружение подпроцесса: SQLite в directory и locmem-кеш.
+
+    profile задаёт DJANGO_SETTINGS_MODULE, env дописывает
+    или заменяет переменные.
+    """
+    env = {
+        **os.environ,
+        'DATABASE_NAME': os.path.join(directory, 'bench.sqlite3'),
+        'CACHE_BACKEND': 'locmem',
+        **env,
+    }
+    if profile is not None:
+        env['DJANGO_SETTINGS_MODULE'] = profile
+    return env
+
+
+def start(directory, *arguments, profile=None, **env):
+    """Запускает manage.py в фоне; stdout читается через communicate()."""
+    return subprocess.Popen(
+        manage_command(*arguments),
+        env=environment(directory, profile, **env),
+        stdout=subprocess.PIPE
+    )
+
+
+def manage(directory, *arguments, profile=None, **env):
+    """Выполняет manage.py и возвращает его stdout.
+
+    Ненулевой код выхода поднимает CalledProcessError.
+    """
+    return subprocess.run(
+        manage_command(*arguments),
+        env=environment(directory, profile, **env),
+        stdout=subprocess.PIPE,
+        check=True
+    ).stdout
+
+
+def run_isolated(*arguments, **env):
+    """manage.py во временном каталоге под базу, который затем удаляется."""
+    with tempfile.TemporaryDirectory() as directory:
+        return manage(directory, *arguments, **env)
@@ -0,0 +1,42 @@
+from django.core.cache.backends.memcached import BaseMemcachedCache
+
+# Клиенты общие на процесс: Django создаёт объект кеша на каждый поток,
+# а пул соединений должен переживать и потоки, и запросы.
+_clients = {}
+
+
+class PooledMemcachedCache(BaseMemcachedCache):
+    """Memcached через pymemcache с пулом соединений на процесс."""
+
+    def __init__(self, server, params):
+        import pymemcache
+        super().__init__(
+            server,
+            params,
+            library=pymemcache,
+            value_not_found_exception=KeyError
+        )
+        self._options = {
+            'allow_unicode_keys': True,
+            'default_noreply': False,
+            'serde': pymemcache.serde.pickle_serde,
+            'use_pooling': True,
+            **self._options,
+        }
+
+    @property
+    def _cache(self):
+        servers = tuple(self._servers)
+        if servers not in _clients:
+            _clients[servers] = self._lib.HashClient(
+                self._servers, **self._options
+            )
+        return _clients[servers]
+
+    def touch(self, key, timeout=None, version=None):
+        key = self.make_key(key, version=version)
+        return self._cache.touch(key, self.get_backend_timeout(timeout))
+
+    def close(self, **kwargs):
+        # Соединения возвращаются в пул, а не закрываются после запроса.
+        pass
@@ -0,0 +1,64 @@
+import re
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Кодировки в порядке предпочтения и расширения их готовых копий.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Максимальные уровни: для заранее сжатых файлов время не важно.
+MAX_LEVELS = {'br': 11, 'gzip': 9}
+
+_ACCEPT_ENCODING = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q=([\d.]+))?\s*')
+
+
+def available():
+    """Кодировки, для которых есть библиотека."""
+    return [
+        (encoding, extension) for encoding, extension in ENCODINGS
+        if encoding != 'br' or brotli is not None
+    ]
+
+
+def accepted(request):
+    """Кодировки из ENCODINGS, которые принимает клиент, по порядку."""
+    weights = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        match = _ACCEPT_ENCODING.fullmatch(part)
+        if match:
+            try:
+                weights[match.group(1).lower()] = float(match.group(2) or 1)
+            except ValueError:
+                continue
+    return [
+        (encoding, extension) for encoding, extension in ENCODINGS
+        if weights.get(encoding, weights.get('*', 0)) > 0
+    ]
+
+
+def compress_stream(chunks, encoding, level=None):
+    """Сжимает поток кусков, не собирая его в памяти."""
+    level = level or MAX_LEVELS[encoding]
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        process, finish = compressor.process, compressor.finish
+    else:
+        # gzip-обёртка zlib пишет mtime=0: одинаковый вход даёт
+        # одинаковые байты.
+        compressor = zlib.compressobj(
+            level, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+        process, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def compress(data, encoding, level=None):
+    """Сжимает data целиком."""
+    return b''.join(compress_stream([data], encoding, level))
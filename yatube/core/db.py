@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.db import connections
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Выставляет SQLITE_PRAGMAS каждому новому соединению с SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def check_connections(**kwargs):
+    """Закрывает постоянные соединения, которые перестали отвечать.
+
+    В Django 2.2 нет CONN_HEALTH_CHECKS, поэтому перед запросом
+    проверяются соединения баз с этим ключом: разорванное соединение
+    закрывается и открывается заново, а не роняет запрос.
+    """
+    for connection in connections.all():
+        if (
+            connection.settings_dict.get('CONN_HEALTH_CHECKS')
+            and connection.connection is not None
+            and not connection.is_usable()
+        ):
+            connection.close()
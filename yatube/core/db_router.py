@@ -0,0 +1,68 @@
+import random
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+# Флаг чтения с реплик живёт в потоке запроса; фоновые потоки
+# и management-команды всегда читают основную базу.
+_state = threading.local()
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+@contextmanager
+def replica_reads():
+    """Внутри блока запросы на чтение уходят на одну реплику.
+
+    Реплика выбирается один раз на блок, то есть на запрос: реплики
+    отстают по-разному, и страница не должна собираться из данных
+    разной свежести.
+    """
+    previous = getattr(_state, 'replica', None)
+    if settings.DATABASE_REPLICAS:
+        _state.replica = random.choice(settings.DATABASE_REPLICAS)
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def reads_replica(view):
+    """Читает данные view с реплики.
+
+    GET-запросы браузера, недавно что-то записавшего (cookie
+    REPLICA_STICKY_COOKIE), остаются на основной базе.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            request.method not in SAFE_METHODS
+            or settings.REPLICA_STICKY_COOKIE in request.COOKIES
+        ):
+            return view(request, *args, **kwargs)
+        with replica_reads():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Чтение внутри replica_reads() — с выбранной для блока реплики,
+    всё остальное — с основной базы. Миграции идут только
+    на основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        return getattr(_state, 'replica', None) or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат ту же схему, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему копированием основной базы.
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,146 @@
+import mimetypes
+import os
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponse, StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from . import compression
+
+# Имена, которые задаёт хеш содержимого: posts.storage (sha256)
+# и миниатюры sorl (md5). Содержимое такого файла никогда не меняется.
+CONTENT_ADDRESSED = re.compile(r'(^|/)[0-9a-f]{32,64}\.\w+$')
+
+_RANGE = re.compile(r'bytes=(\d*)-(\d*)')
+
+CHUNK_SIZE = 64 * 1024
+
+
+@lru_cache(maxsize=None)
+def hashed_static():
+    """Имена с хешем из манифеста collectstatic."""
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def byte_range(header, size):
+    """(начало, конец) из заголовка Range.
+
+    None — заголовок не про один диапазон байт, и отдаётся весь файл;
+    ValueError — диапазон за концом файла.
+    """
+    match = _RANGE.fullmatch(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end or not int(end):
+            return None
+        return max(size - int(end), 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end
+
+
+def _read(path, start, length):
+    with open(path, 'rb') as stream:
+        stream.seek(start)
+        while length > 0:
+            chunk = stream.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _variant(request, path):
+    """Готовая сжатая копия файла, которую принимает клиент."""
+    if 'HTTP_RANGE' in request.META:
+        return path, None
+    for encoding, extension in compression.accepted(request):
+        if os.path.isfile(path + extension):
+            return path + extension, encoding
+    return path, None
+
+
+def _body(request, path, stat, etag, content_type, filename, suffix=''):
+    if settings.SENDFILE_HEADER:
+        # Байты отдаёт фронтовый сервер, в том числе диапазоны; suffix —
+        # расширение выбранной сжатой копии (.br, .gz).
+        response = HttpResponse(content_type=content_type)
+        if settings.SENDFILE_HEADER.lower() == 'x-accel-redirect':
+            location = settings.SENDFILE_PREFIX + request.path + suffix
+        else:
+            location = path
+        response[settings.SENDFILE_HEADER] = location
+        return response
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if header and (not if_range or if_range == etag):
+        try:
+            span = byte_range(header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if span is not None:
+            start, end = span
+            response = StreamingHttpResponse(
+                _read(path, start, end - start + 1),
+                status=206,
+                content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = end - start + 1
+            return response
+    return FileResponse(
+        open(path, 'rb'), content_type=content_type, filename=filename
+    )
+
+
+def serve(request, root, name, max_age, immutable=False):
+    """Отдаёт файл name из каталога root.
+
+    Отвечает 304 по ETag и Last-Modified, 206 на запрос диапазона,
+    выбирает готовую .br/.gz копию по Accept-Encoding, а с
+    SENDFILE_HEADER оставляет передачу байтов фронтовому серверу.
+    """
+    try:
+        path = safe_join(root, name)
+    except SuspiciousFileOperation:
+        raise Http404(name)
+    if not os.path.isfile(path):
+        raise Http404(name)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    source = path
+    path, encoding = _variant(request, source)
+    stat = os.stat(path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        response = _body(
+            request, path, stat, etag, content_type, os.path.basename(name),
+            suffix=path[len(source):]
+        )
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    cache_control = f'public, max-age={max_age}'
+    if immutable:
+        cache_control += ', immutable'
+    response['Cache-Control'] = cache_control
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
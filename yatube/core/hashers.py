@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    BCryptSHA256PasswordHasher,
+    PBKDF2PasswordHasher,
+)
+
+# Имена алгоритмов совпадают со стандартными: при смене стоимости
+# must_update() пересчитает хеш при следующем входе пользователя.
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 со стоимостью из ARGON2_TIME_COST, ARGON2_MEMORY_COST
+    и ARGON2_PARALLELISM."""
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'ARGON2_TIME_COST', 2)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'ARGON2_MEMORY_COST', 512)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'ARGON2_PARALLELISM', 2)
+
+
+class TunedBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+    """bcrypt с числом раундов из BCRYPT_ROUNDS."""
+
+    @property
+    def rounds(self):
+        return getattr(settings, 'BCRYPT_ROUNDS', 12)
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 с числом итераций из PBKDF2_ITERATIONS."""
+
+    @property
+    def iterations(self):
+        return getattr(
+            settings, 'PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations
+        )
@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from core import bench
+from posts import page_cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Доля попаданий в кеш главной страницы, когда её обслуживают '
+        'несколько процессов-воркеров с разными бэкендами кеша.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=5,
+            help='Сколько разных страниц ленты запрашивают воркеры.'
+        )
+        parser.add_argument(
+            '--backends',
+            nargs='+',
+            default=['locmem', 'file'],
+            choices=sorted(settings.CACHE_BACKENDS),
+            help='file с общим каталогом заменяет общий сервер кеша.'
+        )
+        parser.add_argument(
+            '--worker', action='store_true', help=argparse.SUPPRESS
+        )
+        parser.add_argument('--seed', type=int, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.run_worker(
+                options['requests'], options['pages'], options['seed']
+            )
+            return
+        for backend in options['backends']:
+            with tempfile.TemporaryDirectory() as directory:
+                counters = self.run_backend(backend, directory, options)
+            served = counters['hit'] + counters['stale']
+            total = served + counters['miss']
+            self.stdout.write(
+                f'{backend}: воркеров {options["workers"]}, '
+                f'запросов {total}, попаданий {served / total:.1%}'
+            )
+
+    def run_backend(self, backend, directory, options):
+        # Своя база с постами на все запрашиваемые страницы ленты.
+        bench.manage(directory, 'migrate', '--verbosity', '0')
+        bench.manage(
+            directory, 'seed', '--users', '20', '--groups', '2',
+            '--posts', str(options['pages'] * settings.NUMBERS_POSTS),
+            '--comments', '0', '--follows', '20'
+        )
+        env = {
+            'CACHE_BACKEND': backend,
+            'CACHE_KEY_PREFIX': f'bench-{uuid.uuid4().hex}',
+        }
+        if backend == 'file':
+            env['CACHE_LOCATION'] = os.path.join(directory, 'cache')
+        workers = [
+            bench.start(
+                directory, 'bench_cache', '--worker',
+                '--requests', str(options['requests']),
+                '--pages', str(options['pages']),
+                '--seed', str(number),
+                **env
+            )
+            for number in range(options['workers'])
+        ]
+        counters = Counter()
+        for worker in workers:
+            output, _ = worker.communicate()
+            counters.update(json.loads(output))
+        return counters
+
+    def run_worker(self, requests, pages, seed):
+        # Каждый воркер ходит по страницам в своём случайном порядке,
+        # как независимые посетители.
+        choice = random.Random(seed).randint
+        client = Client()
+        for _ in range(requests):
+            client.get('/', {'page': choice(1, pages)})
+        self.stdout.write(json.dumps(page_cache.counters))
@@ -0,0 +1,115 @@
+import argparse
+import copy
+import json
+import statistics
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core import bench, compression
+from posts.models import ProfileStats
+
+
+def templates(collapse):
+    """TEMPLATES с кешем шаблонов, со сжатием пробелов или без."""
+    loaders = settings.TEMPLATE_LOADERS
+    if collapse:
+        loaders = [
+            ('core.template_loaders.CollapseWhitespaceLoader', loaders)
+        ]
+    config = copy.deepcopy(settings.TEMPLATES)
+    config[0]['APP_DIRS'] = False
+    config[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', loaders)
+    ]
+    return config
+
+
+class Command(BaseCommand):
+    help = (
+        'Размер и время ответа index и profile без сжатия, с gzip и br, '
+        'со сведением пробелов в шаблонах и без.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument(
+            '--bandwidth',
+            type=float,
+            default=10,
+            help='Мбит/с для оценки времени передачи.'
+        )
+        parser.add_argument(
+            '--run', action='store_true', help=argparse.SUPPRESS
+        )
+
+    def handle(self, *args, **options):
+        if options['run']:
+            self.stdout.write(json.dumps(self.run(options)))
+            return
+        output = bench.run_isolated(
+            'bench_compression', '--run',
+            '--requests', str(options['requests']),
+            '--posts', str(options['posts']),
+        )
+        bytes_per_ms = options['bandwidth'] * 1000 / 8
+        for row in json.loads(output):
+            transfer = row['bytes'] / bytes_per_ms
+            self.stdout.write(
+                f'{row["view"]:8} {row["variant"]:18} '
+                f'{row["bytes"]:8} байт  сервер {row["ms"]:6.2f} мс  '
+                f'+ передача {transfer:6.2f} мс'
+            )
+
+    def run(self, options):
+        call_command('migrate', verbosity=0)
+        call_command(
+            'seed', '--users', '100', '--groups', '10',
+            '--posts', str(options['posts']), '--comments', '2000',
+            '--follows', '500', stdout=StringIO()
+        )
+        author = ProfileStats.objects.select_related('user').order_by(
+            '-posts_count'
+        ).first().user.username
+        urls = {
+            'index': reverse('posts:index'),
+            'profile': reverse('posts:profile', args=[author]),
+        }
+        encodings = ['identity'] + [
+            encoding for encoding, _ in reversed(compression.available())
+        ]
+        client = Client()
+        rows = []
+        for collapse in (False, True):
+            with override_settings(TEMPLATES=templates(collapse)):
+                for view, url in urls.items():
+                    for encoding in encodings:
+                        rows.append(self.measure(
+                            client, view, url, encoding, collapse,
+                            options['requests']
+                        ))
+        return rows
+
+    def measure(self, client, view, url, encoding, collapse, requests):
+        timings = []
+        for _ in range(requests):
+            # Каждый запрос рендерит страницу заново: сравниваются
+            # рендеринг и сжатие, а не попадание в кеш страниц.
+            cache.clear()
+            started = time.perf_counter()
+            response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+            timings.append(time.perf_counter() - started)
+        variant = encoding + (' + пробелы' if collapse else '')
+        return {
+            'view': view,
+            'variant': variant,
+            'bytes': len(response.content),
+            'ms': statistics.median(timings) * 1000,
+        }
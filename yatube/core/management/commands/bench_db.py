@@ -0,0 +1,120 @@
+import argparse
+import json
+import random
+import tempfile
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import OperationalError
+
+from core import bench
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+PROFILES = ('yatube.settings', 'yatube.settings_production')
+
+
+class Command(BaseCommand):
+    help = (
+        'Пропускная способность SQLite при смешанной нагрузке '
+        'чтение/запись из нескольких процессов для профилей настроек.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument(
+            '--duration', type=float, default=5, help='Секунд на профиль.'
+        )
+        parser.add_argument(
+            '--write-ratio',
+            type=float,
+            default=0.2,
+            help='Доля операций записи.'
+        )
+        parser.add_argument('--posts', type=int, default=200)
+        parser.add_argument('--profiles', nargs='+', default=list(PROFILES))
+        parser.add_argument(
+            '--worker', action='store_true', help=argparse.SUPPRESS
+        )
+        parser.add_argument(
+            '--setup', action='store_true', help=argparse.SUPPRESS
+        )
+
+    def handle(self, *args, **options):
+        if options['setup']:
+            self.setup(options['posts'])
+            return
+        if options['worker']:
+            self.run_worker(options['duration'], options['write_ratio'])
+            return
+        for profile in options['profiles']:
+            # Каждый профиль получает свою свежую базу: режим WAL
+            # сохраняется в файле и исказил бы следующий замер.
+            with tempfile.TemporaryDirectory() as directory:
+                counters = self.run_profile(profile, directory, options)
+            self.stdout.write(
+                f'{profile}: {counters["ops"] / options["duration"]:.0f} '
+                f'оп/с, записей {counters["writes"]}, '
+                f'чтений {counters["reads"]}, '
+                f'ошибок блокировки {counters["locked"]}'
+            )
+
+    def run_profile(self, profile, directory, options):
+        bench.manage(directory, 'migrate', '--verbosity', '0', profile=profile)
+        bench.manage(
+            directory, 'bench_db', '--setup', '--posts', str(options['posts']),
+            profile=profile
+        )
+        workers = [
+            bench.start(
+                directory, 'bench_db', '--worker',
+                '--duration', str(options['duration']),
+                '--write-ratio', str(options['write_ratio']),
+                profile=profile
+            )
+            for _ in range(options['workers'])
+        ]
+        counters = Counter()
+        for worker in workers:
+            output, _ = worker.communicate()
+            counters.update(json.loads(output))
+        return counters
+
+    def setup(self, posts):
+        author = User.objects.create_user(username='bench')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {number}')
+            for number in range(posts)
+        )
+
+    def run_worker(self, duration, write_ratio):
+        author = User.objects.get(username='bench')
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        counters = Counter()
+        deadline = time.time() + duration
+        while time.time() < deadline:
+            # Сигналы запроса управляют жизнью соединения (CONN_MAX_AGE)
+            # так же, как в обработчике HTTP.
+            request_started.send(sender=self.__class__)
+            try:
+                if random.random() < write_ratio:
+                    Comment.objects.create(
+                        post_id=random.choice(post_ids),
+                        author=author,
+                        text='Комментарий'
+                    )
+                    counters['writes'] += 1
+                else:
+                    list(Post.objects.for_feed()[:settings.NUMBERS_POSTS])
+                    counters['reads'] += 1
+                counters['ops'] += 1
+            except OperationalError:
+                counters['locked'] += 1
+            finally:
+                request_finished.send(sender=self.__class__)
+        self.stdout.write(json.dumps(counters))
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from core import bench
+
+HASHERS = {
+    'md5': 'django.contrib.auth.hashers.MD5PasswordHasher',
+    'pbkdf2': 'core.hashers.TunedPBKDF2PasswordHasher',
+    'argon2': 'core.hashers.TunedArgon2PasswordHasher',
+    'bcrypt': 'core.hashers.TunedBCryptSHA256PasswordHasher',
+}
+
+PROFILES = ('yatube.settings', 'yatube.settings_test')
+
+
+def available(path):
+    """Есть ли библиотека, которая нужна хешеру."""
+    hasher = import_string(path)()
+    if hasher.library is None:
+        return True
+    try:
+        hasher._load_library()
+    except ValueError:
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    help = (
+        'Пропускная способность регистрации с разными хешерами паролей '
+        'и время тестов в обычном и тестовом профилях настроек.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hashers',
+            nargs='+',
+            default=list(HASHERS),
+            choices=list(HASHERS)
+        )
+        parser.add_argument('--signups', type=int, default=50)
+        parser.add_argument(
+            '--suite',
+            action='store_true',
+            help='Прогнать manage.py test в профилях ' + ', '.join(PROFILES)
+        )
+        parser.add_argument(
+            '--worker', action='store_true', help=argparse.SUPPRESS
+        )
+        parser.add_argument('--hasher', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.run_worker(options['hasher'], options['signups'])
+            return
+        with tempfile.TemporaryDirectory() as directory:
+            bench.manage(directory, 'migrate', '--verbosity', '0')
+            for hasher in options['hashers']:
+                if not available(HASHERS[hasher]):
+                    self.stdout.write(f'{hasher}: нет библиотеки, пропущен')
+                    continue
+                result = json.loads(bench.manage(
+                    directory, 'bench_hashers', '--worker',
+                    '--hasher', hasher,
+                    '--signups', str(options['signups']),
+                ))
+                self.stdout.write(
+                    f'{hasher}: {result["signups"] / result["seconds"]:.1f} '
+                    f'регистраций/с, '
+                    f'{result["seconds"] / result["signups"] * 1000:.1f} мс '
+                    f'на регистрацию, ошибок {result["failed"]}'
+                )
+        if options['suite']:
+            for profile in PROFILES:
+                self.time_suite(profile)
+
+    def time_suite(self, profile):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': profile}
+        started = time.perf_counter()
+        finished = subprocess.run(
+            bench.manage_command('test', '--verbosity', '0'),
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        seconds = time.perf_counter() - started
+        status = 'ok' if finished.returncode == 0 else 'тесты упали'
+        self.stdout.write(f'тесты, {profile}: {seconds:.1f} с ({status})')
+
+    def run_worker(self, hasher, signups):
+        client = Client()
+        url = reverse('users:signup')
+        failed = 0
+        with override_settings(PASSWORD_HASHERS=[HASHERS[hasher]]):
+            started = time.perf_counter()
+            for number in range(signups):
+                response = client.post(url, {
+                    'username': f'{hasher}{number}',
+                    'email': f'{hasher}{number}@example.com',
+                    'password1': 'Nq7-bench-Password',
+                    'password2': 'Nq7-bench-Password',
+                })
+                failed += response.status_code != 302
+            seconds = time.perf_counter() - started
+        self.stdout.write(json.dumps({
+            'signups': signups, 'seconds': seconds, 'failed': failed,
+        }))
@@ -0,0 +1,126 @@
+import argparse
+import copy
+import json
+import re
+import statistics
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core import bench
+from core.template_backends import warm_up
+from posts.models import Group, ProfileStats
+
+User = get_user_model()
+
+CACHED = [
+    ('django.template.loaders.cached.Loader', settings.TEMPLATE_LOADERS),
+]
+
+# Вариант -> (загрузчики, прогрев до первого запроса).
+VARIANTS = {
+    'без кеша': (settings.TEMPLATE_LOADERS, False),
+    'cached': (CACHED, False),
+    'cached + прогрев': (CACHED, True),
+}
+
+TEMPLATE_TIME = re.compile(r'tpl;dur=([\d.]+)')
+
+
+def templates(loaders):
+    config = copy.deepcopy(settings.TEMPLATES)
+    config[0]['APP_DIRS'] = False
+    config[0]['OPTIONS']['loaders'] = loaders
+    return config
+
+
+class Command(BaseCommand):
+    help = (
+        'Время первого и последующих рендерингов страниц лент '
+        'без кеша шаблонов, с cached.Loader и с прогревом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument(
+            '--run', action='store_true', help=argparse.SUPPRESS
+        )
+
+    def handle(self, *args, **options):
+        if options['run']:
+            self.stdout.write(json.dumps(self.run(options)))
+            return
+        output = bench.run_isolated(
+            'bench_templates', '--run',
+            '--requests', str(options['requests']),
+            '--posts', str(options['posts']),
+        )
+        for row in json.loads(output):
+            self.stdout.write(
+                f'{row["view"]:13} {row["variant"]:17} '
+                f'первый {row["first_ms"]:6.2f} мс, '
+                f'далее {row["ms"]:6.2f} мс '
+                f'(шаблоны {row["template_ms"]:6.2f} мс)'
+            )
+
+    def run(self, options):
+        call_command('migrate', verbosity=0)
+        call_command(
+            'seed', '--users', '100', '--groups', '10',
+            '--posts', str(options['posts']), '--comments', '2000',
+            '--follows', '500', stdout=StringIO()
+        )
+        author = ProfileStats.objects.select_related('user').order_by(
+            '-posts_count'
+        ).first().user
+        reader = User.objects.filter(follower__isnull=False).first()
+        urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', args=[Group.objects.first().slug]
+            ),
+            'profile': reverse('posts:profile', args=[author.username]),
+            'follow_index': reverse('posts:follow_index'),
+        }
+        client = Client()
+        client.force_login(reader)
+        rows = []
+        for variant, (loaders, warm) in VARIANTS.items():
+            for view, url in urls.items():
+                # Новые настройки шаблонов дают новый движок с пустым
+                # кешем: первый запрос — как у свежего воркера.
+                with override_settings(TEMPLATES=templates(loaders)):
+                    if warm:
+                        warm_up()
+                    rows.append(self.measure(
+                        client, view, url, variant, options['requests']
+                    ))
+        return rows
+
+    def measure(self, client, view, url, variant, requests):
+        timings = []
+        template_timings = []
+        for _ in range(requests + 1):
+            # Страница рендерится заново, а не берётся из кеша страниц.
+            cache.clear()
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - started)
+            template_timings.append(float(
+                TEMPLATE_TIME.search(response['Server-Timing']).group(1)
+            ))
+        return {
+            'view': view,
+            'variant': variant,
+            'first_ms': timings[0] * 1000,
+            'ms': statistics.median(timings[1:]) * 1000,
+            'template_ms': statistics.median(template_timings[1:]),
+        }
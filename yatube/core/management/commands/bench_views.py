@@ -0,0 +1,305 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import threading
+import time
+from http.client import HTTPConnection
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test import Client
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+from faker import Faker
+from mixer.backend.django import mixer
+
+from core import bench
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SCENARIOS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+    'add_comment',
+)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную базу через mixer/Faker и замеряет '
+        'пропускную способность и задержки p50/p99 страниц posts '
+        'через тестовый клиент и WSGI-сервер. Итог пишется в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--comments', type=int, default=1000)
+        parser.add_argument('--follows', type=int, default=200)
+        parser.add_argument(
+            '--requests', type=int, default=200, help='Запросов на сценарий.'
+        )
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS
+        )
+        parser.add_argument(
+            '--transports',
+            nargs='+',
+            choices=('client', 'wsgi'),
+            default=('client', 'wsgi')
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кеш перед каждым запросом.'
+        )
+        parser.add_argument('--output', help='Куда сохранить JSON.')
+        parser.add_argument(
+            '--baseline', help='JSON прошлого замера для сравнения.'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Допустимый рост p50 относительно --baseline.'
+        )
+        parser.add_argument(
+            '--run', action='store_true', help=argparse.SUPPRESS
+        )
+
+    def handle(self, *args, **options):
+        if options['run']:
+            self.stdout.write(json.dumps(self.run(options)))
+            return
+        output = bench.run_isolated(
+            'bench_views', '--run', *self.forwarded(options)
+        )
+        report = json.loads(output)
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['tolerance'])
+
+    def forwarded(self, options):
+        arguments = []
+        for name in (
+            'users', 'groups', 'posts', 'comments', 'follows', 'requests',
+            'warmup', 'seed',
+        ):
+            arguments += [f'--{name}', str(options[name])]
+        arguments += ['--scenarios', *options['scenarios']]
+        arguments += ['--transports', *options['transports']]
+        if options['cold']:
+            arguments.append('--cold')
+        return arguments
+
+    def run(self, options):
+        call_command('migrate', verbosity=0)
+        started = time.perf_counter()
+        self.seed(options)
+        seeded = time.perf_counter() - started
+        self.random = random.Random(options['seed'])
+        self.user = User.objects.filter(follower__isnull=False).first()
+        self.ids = {
+            'groups': list(Group.objects.values_list('slug', flat=True)),
+            'authors': list(User.objects.filter(
+                author_posts__isnull=False
+            ).distinct().values_list('username', flat=True)),
+            'posts': list(Post.objects.values_list('pk', flat=True)),
+        }
+        results = {}
+        for transport in options['transports']:
+            send = getattr(self, f'{transport}_sender')()
+            results[transport] = {
+                scenario: self.measure(send, scenario, options)
+                for scenario in options['scenarios']
+            }
+        return {
+            'meta': {
+                'volumes': {
+                    name: options[name] for name in (
+                        'users', 'groups', 'posts', 'comments', 'follows'
+                    )
+                },
+                'requests': options['requests'],
+                'cold': options['cold'],
+                'seed_seconds': round(seeded, 2),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'results': results,
+        }
+
+    def seed(self, options):
+        fake = Faker('ru_RU')
+        fake.seed_instance(options['seed'])
+        choice = random.Random(options['seed']).choice
+        users = mixer.cycle(options['users']).blend(
+            User, username=mixer.sequence('bench{0}')
+        )
+        groups = mixer.cycle(options['groups']).blend(
+            Group, slug=mixer.sequence('group-{0}')
+        )
+        posts = [
+            mixer.blend(
+                Post,
+                author=choice(users),
+                group=choice(groups + [None]),
+                text=fake.text(max_nb_chars=400),
+                image=''
+            )
+            for _ in range(options['posts'])
+        ]
+        for _ in range(options['comments']):
+            mixer.blend(
+                Comment,
+                post=choice(posts),
+                author=choice(users),
+                text=fake.sentence()
+            )
+        pairs = set()
+        while len(pairs) < min(
+            options['follows'], len(users) * (len(users) - 1)
+        ):
+            user, author = choice(users), choice(users)
+            if user != author and (user, author) not in pairs:
+                pairs.add((user, author))
+                Follow.objects.create(user=user, author=author)
+
+    def request_for(self, scenario):
+        """(метод, адрес, нужен ли вход) для очередного запроса."""
+        choice = self.random.choice
+        if scenario == 'index':
+            return 'GET', reverse('posts:index'), False
+        pages = {
+            'group_posts': ('posts:group_list', 'groups'),
+            'profile': ('posts:profile', 'authors'),
+            'post_detail': ('posts:post_detail', 'posts'),
+        }
+        if scenario in pages:
+            name, ids = pages[scenario]
+            return 'GET', reverse(name, args=[choice(self.ids[ids])]), False
+        if scenario == 'follow_index':
+            return 'GET', reverse('posts:follow_index'), True
+        url = reverse('posts:add_comment', args=[choice(self.ids['posts'])])
+        return 'POST', url, True
+
+    def client_sender(self):
+        guest, member = Client(), Client()
+        member.force_login(self.user)
+
+        def send(method, url, authorized):
+            client = member if authorized else guest
+            if method == 'POST':
+                return client.post(url, {'text': 'Комментарий'}).status_code
+            return client.get(url).status_code
+        return send
+
+    def wsgi_sender(self):
+        server = make_server(
+            '127.0.0.1', 0, get_wsgi_application(), handler_class=QuietHandler
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        login = Client()
+        login.force_login(self.user)
+        csrf = get_random_string(32)
+        cookie = (
+            f'{settings.SESSION_COOKIE_NAME}='
+            f'{login.cookies[settings.SESSION_COOKIE_NAME].value}; '
+            f'{settings.CSRF_COOKIE_NAME}={csrf}'
+        )
+
+        def send(method, url, authorized):
+            connection = HTTPConnection('127.0.0.1', server.server_port)
+            headers = {'Cookie': cookie} if authorized else {}
+            body = None
+            if method == 'POST':
+                body = 'text=%D0%94%D0%B0'
+                headers.update({
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                    'X-CSRFToken': csrf,
+                })
+            connection.request(method, url, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            return response.status
+        return send
+
+    def measure(self, send, scenario, options):
+        for _ in range(options['warmup']):
+            send(*self.request_for(scenario))
+        timings = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            request = self.request_for(scenario)
+            if options['cold']:
+                cache.clear()
+            began = time.perf_counter()
+            status = send(*request)
+            timings.append(time.perf_counter() - began)
+            if status >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - started
+        timings.sort()
+        return {
+            'requests': len(timings),
+            'errors': errors,
+            'rps': round(len(timings) / elapsed, 1),
+            'p50_ms': round(statistics.median(timings) * 1000, 2),
+            'p99_ms': round(
+                timings[int(len(timings) * 0.99) - 1] * 1000, 2
+            ),
+        }
+
+    def print_report(self, report):
+        for transport, scenarios in report['results'].items():
+            for scenario, result in scenarios.items():
+                self.stdout.write(
+                    f'{transport:6} {scenario:12} '
+                    f'{result["rps"]:8.1f} зап/с  '
+                    f'p50 {result["p50_ms"]:7.2f} мс  '
+                    f'p99 {result["p99_ms"]:7.2f} мс  '
+                    f'ошибок {result["errors"]}'
+                )
+
+    def compare(self, report, baseline_path, tolerance):
+        with open(baseline_path, encoding='utf-8') as stream:
+            baseline = json.load(stream)['results']
+        regressions = []
+        for transport, scenarios in report['results'].items():
+            for scenario, result in scenarios.items():
+                before = baseline.get(transport, {}).get(scenario)
+                if before is None:
+                    continue
+                ratio = result['p50_ms'] / before['p50_ms']
+                self.stdout.write(
+                    f'{transport:6} {scenario:12} p50 x{ratio:.2f} '
+                    f'к базовому замеру'
+                )
+                if ratio > 1 + tolerance:
+                    regressions.append(f'{transport}/{scenario}')
+        if regressions:
+            raise CommandError(
+                'Замедление больше допустимого: ' + ', '.join(regressions)
+            )
@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Границы корзин гистограмм времени, секунды.
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Границы корзин гистограммы числа SQL-запросов.
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def _sample(name, labels, value):
+    pairs = ','.join(f'{label}="{text}"' for label, text in labels)
+    return f'{name}{{{pairs}}} {value}' if pairs else f'{name} {value}'
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus с метками по имени view."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = defaultdict(lambda: [[0] * len(buckets), 0, 0])
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            counts, total, count = self.series[key]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self.series[key] = [counts, total + value, count + 1]
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with _lock:
+            series = list(self.series.items())
+        for key, (counts, total, count) in sorted(series):
+            for bound, bucket in zip(self.buckets, counts):
+                lines.append(_sample(
+                    f'{self.name}_bucket', key + (('le', bound),), bucket
+                ))
+            lines.append(_sample(
+                f'{self.name}_bucket', key + (('le', '+Inf'),), count
+            ))
+            lines.append(_sample(f'{self.name}_sum', key, total))
+            lines.append(_sample(f'{self.name}_count', key, count))
+        return lines
+
+
+class Counters:
+    """Счётчики событий Prometheus с метками по имени view."""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = Counter()
+
+    def inc(self, amount=1, **labels):
+        with _lock:
+            self.values[tuple(sorted(labels.items()))] += amount
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} counter',
+        ]
+        with _lock:
+            values = list(self.values.items())
+        for key, value in sorted(values):
+            lines.append(_sample(self.name, key, value))
+        return lines
+
+
+REQUEST_TIME = Histogram(
+    'yatube_request_seconds', 'Время обработки запроса.', TIME_BUCKETS
+)
+DB_QUERIES = Histogram(
+    'yatube_db_queries', 'SQL-запросов за запрос.', QUERY_BUCKETS
+)
+DB_TIME = Histogram(
+    'yatube_db_seconds', 'Время SQL-запросов за запрос.', TIME_BUCKETS
+)
+TEMPLATE_TIME = Histogram(
+    'yatube_template_seconds', 'Время рендеринга шаблонов.', TIME_BUCKETS
+)
+THUMBNAIL_TIME = Histogram(
+    'yatube_thumbnail_seconds', 'Время создания миниатюр поста.',
+    TIME_BUCKETS
+)
+CACHE_EVENTS = Counters(
+    'yatube_cache_events_total', 'Попадания и промахи кешей.'
+)
+
+METRICS = (
+    REQUEST_TIME, DB_QUERIES, DB_TIME, TEMPLATE_TIME, THUMBNAIL_TIME,
+    CACHE_EVENTS,
+)
+
+
+class RequestStats:
+    """Замеры одного запроса: время по этапам и события."""
+
+    def __init__(self):
+        self.timings = Counter()
+        self.events = Counter()
+        self.queries = 0
+
+
+def begin():
+    _local.stats = RequestStats()
+    return _local.stats
+
+
+def end():
+    _local.stats = None
+
+
+def current():
+    """Замеры текущего запроса или None вне запроса."""
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def timer(name, histogram=None):
+    """Добавляет время блока к этапу name текущего запроса."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stats = current()
+        if stats is not None:
+            stats.timings[name] += elapsed
+        if histogram is not None:
+            histogram.observe(elapsed)
+
+
+def event(name, amount=1):
+    """Отмечает событие (например, cache_hit) в текущем запросе."""
+    if not amount:
+        return
+    stats = current()
+    if stats is not None:
+        stats.events[name] += amount
+    else:
+        CACHE_EVENTS.inc(amount, event=name, view='background')
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """execute_wrapper: считает запросы и их время."""
+    stats = current()
+    if stats is None:
+        return execute(sql, params, many, context)
+    stats.queries += 1
+    with timer('db'):
+        return execute(sql, params, many, context)
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
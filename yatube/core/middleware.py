@@ -0,0 +1,151 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from . import compression, metrics
+from .db_router import SAFE_METHODS
+
+
+class ReplicaStickinessMiddleware:
+    """Привязывает браузер к основной базе после записи.
+
+    До истечения cookie view с reads_replica читают основную базу:
+    автор сразу видит свои изменения, даже если реплики отстают.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE,
+                '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+
+class MetricsMiddleware:
+    """Замеряет запрос: общее время, SQL, шаблоны и обращения к кешам.
+
+    Итог отдаётся клиенту в заголовке Server-Timing и копится
+    в гистограммах по имени URL для /metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = metrics.begin()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.query_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.end()
+        total = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        metrics.REQUEST_TIME.observe(total, view=view)
+        metrics.DB_QUERIES.observe(stats.queries, view=view)
+        metrics.DB_TIME.observe(stats.timings['db'], view=view)
+        metrics.TEMPLATE_TIME.observe(stats.timings['template'], view=view)
+        for name, amount in stats.events.items():
+            metrics.CACHE_EVENTS.inc(amount, event=name, view=view)
+        response['Server-Timing'] = self.server_timing(stats, total)
+        return response
+
+    def server_timing(self, stats, total):
+        entries = [
+            f'app;dur={total * 1000:.1f}',
+            f'db;dur={stats.timings["db"] * 1000:.1f};'
+            f'desc="{stats.queries} SQL"',
+            f'tpl;dur={stats.timings["template"] * 1000:.1f}',
+        ]
+        if stats.timings['thumbnail']:
+            entries.append(
+                f'thumb;dur={stats.timings["thumbnail"] * 1000:.1f}'
+            )
+        if stats.events:
+            events = ' '.join(
+                f'{name}={amount}'
+                for name, amount in sorted(stats.events.items())
+            )
+            entries.append(f'cache;desc="{events}"')
+        return ', '.join(entries)
+
+
+class CompressionMiddleware:
+    """Сжимает текстовые ответы в br или gzip по Accept-Encoding.
+
+    Потоковые ответы сжимаются по кускам, не собираясь в памяти.
+    Ответы короче COMPRESS_MIN_SIZE, уже сжатые, частичные и не
+    текстовые отдаются как есть.
+    """
+
+    COMPRESSIBLE_TYPES = (
+        'text/', 'application/json', 'application/javascript',
+        'application/xml', 'image/svg+xml',
+    )
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def compressible(self, response):
+        if response.has_header('Content-Encoding'):
+            return False
+        if response.status_code == 206:
+            return False
+        if not response.get('Content-Type', '').startswith(
+            self.COMPRESSIBLE_TYPES
+        ):
+            return False
+        return response.streaming or (
+            len(response.content) >= settings.COMPRESS_MIN_SIZE
+        )
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        usable = dict(compression.available())
+        encodings = [
+            encoding for encoding, _ in compression.accepted(request)
+            if encoding in usable
+        ]
+        if not encodings:
+            return response
+        encoding = encodings[0]
+        level = settings.COMPRESS_LEVELS[encoding]
+        if response.streaming:
+            response.streaming_content = compression.compress_stream(
+                response.streaming_content, encoding, level
+            )
+            del response['Content-Length']
+        else:
+            compressed = compression.compress(
+                response.content, encoding, level
+            )
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        # Сжатое тело не совпадает по байтам с исходным, но по смыслу
+        # то же: условный GET сравнивает слабые ETag.
+        etag = response.get('ETag')
+        if etag and not etag.startswith('W/'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+from . import compression
+
+COMPRESSIBLE = (
+    '.css', '.js', '.map', '.svg', '.json', '.txt', '.xml', '.html', '.ico',
+)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Имена с хешем содержимого плюс готовые .br и .gz копии.
+
+    collectstatic сжимает каждый текстовый файл один раз на
+    максимальном уровне, а core.files.serve выбирает копию по
+    Accept-Encoding без сжатия на лету.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            self.precompress(name)
+
+    def precompress(self, name):
+        if not name.endswith(COMPRESSIBLE):
+            return
+        with self.open(name) as original:
+            data = original.read()
+        if len(data) < settings.COMPRESS_MIN_SIZE:
+            return
+        for encoding, extension in compression.available():
+            compressed = compression.compress(data, encoding)
+            # Копия, почти не меньше оригинала, не стоит лишнего файла.
+            if len(compressed) > len(data) * 0.95:
+                continue
+            if self.exists(name + extension):
+                self.delete(name + extension)
+            self._save(name + extension, ContentFile(compressed))
@@ -0,0 +1,72 @@
+import logging
+import os
+
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.backends.django import (
+    DjangoTemplates, Template, reraise
+)
+from django.template.loaders.cached import Loader as CachedLoader
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with metrics.timer('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблоны Django, чей рендеринг попадает в замеры запроса."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name), self
+            )
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+    def template_names(self):
+        """Имена всех файлов из DIRS движка."""
+        for directory in self.engine.dirs:
+            for root, _, files in os.walk(directory):
+                for filename in sorted(files):
+                    path = os.path.relpath(
+                        os.path.join(root, filename), directory
+                    )
+                    yield path.replace(os.sep, '/')
+
+    def warm_up(self):
+        """Разбирает все шаблоны из DIRS в кеш cached.Loader.
+
+        Возвращает число разобранных шаблонов; без cached.Loader
+        разбор пропал бы, и прогрев не делается.
+        """
+        if not any(
+            isinstance(loader, CachedLoader)
+            for loader in self.engine.template_loaders
+        ):
+            return 0
+        count = 0
+        for name in self.template_names():
+            try:
+                self.engine.get_template(name)
+            except (TemplateDoesNotExist, TemplateSyntaxError):
+                logger.exception('Не удалось разобрать шаблон %s', name)
+                continue
+            count += 1
+        return count
+
+
+def warm_up():
+    """Прогревает кеш шаблонов всех движков; для старта воркера."""
+    return sum(
+        engine.warm_up() for engine in engines.all()
+        if isinstance(engine, TimedDjangoTemplates)
+    )
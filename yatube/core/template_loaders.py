@@ -0,0 +1,52 @@
+import re
+
+from django.template import Origin
+from django.template.loaders.base import Loader
+
+# Внутри этих тегов пробелы значимы.
+_PRESERVE = re.compile(r'<(pre|textarea)\b.*?</\1\s*>', re.S | re.I)
+_INDENT = re.compile(r'[ \t\r\f\v]*\n\s*')
+
+
+def collapse_whitespace(source):
+    """Сводит отступы и пустые строки к одному переводу строки.
+
+    Перевод строки остаётся, поэтому текст и скрипты читаются так же;
+    содержимое <pre> и <textarea> не меняется.
+    """
+    parts = []
+    position = 0
+    for match in _PRESERVE.finditer(source):
+        parts.append(_INDENT.sub('\n', source[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(_INDENT.sub('\n', source[position:]))
+    return ''.join(parts)
+
+
+class CollapseWhitespaceLoader(Loader):
+    """Загрузчик-обёртка: сжимает пробелы в исходнике до разбора.
+
+    Под cached.Loader это делается один раз на шаблон, а не на
+    каждый рендеринг.
+    """
+
+    def __init__(self, engine, loaders):
+        self.loaders = engine.get_template_loaders(loaders)
+        super().__init__(engine)
+
+    def get_template_sources(self, template_name):
+        for loader in self.loaders:
+            for origin in loader.get_template_sources(template_name):
+                wrapped = Origin(origin.name, origin.template_name, self)
+                wrapped.source_loader = loader
+                yield wrapped
+
+    def get_contents(self, origin):
+        return collapse_whitespace(
+            origin.source_loader.get_contents(origin)
+        )
+
+    def reset(self):
+        for loader in self.loaders:
+            loader.reset()
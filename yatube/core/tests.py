@@ -1,6 +1,32 @@
+import copy
+import gzip
+import os
+import shutil
+import tempfile
 from http import HTTPStatus
+from io import StringIO
+from unittest import skipUnless
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory, TestCase, override_settings
+
+from posts.models import Post
+
+from . import compression
+from .db import configure_sqlite
+from .db_router import ReplicaRouter, reads_replica
+from .hashers import TunedPBKDF2PasswordHasher
+from .template_backends import warm_up
+from .template_loaders import collapse_whitespace
+
+User = get_user_model()
 
 
 class CoreViewTest(TestCase):
@@ -10,3 +36,226 @@ class CoreViewTest(TestCase):
         # Проверьте, что используется шаблон core/404.html
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        @reads_replica
+        def view(request):
+            router = ReplicaRouter()
+            aliases = {router.db_for_read(Post) for _ in range(20)}
+            return HttpResponse(','.join(aliases))
+
+        self.view = view
+        self.factory = RequestFactory()
+
+    def test_reads_go_to_replicas(self):
+        """Помеченные view читают с реплик, остальное — с основной базы"""
+        response = self.view(self.factory.get('/'))
+        self.assertIn(response.content.decode(), settings.DATABASE_REPLICAS)
+        response = self.view(self.factory.post('/'))
+        self.assertEqual(response.content.decode(), 'default')
+        self.assertEqual(ReplicaRouter().db_for_read(Post), 'default')
+        self.assertEqual(ReplicaRouter().db_for_write(Post), 'default')
+
+    def test_one_replica_per_request(self):
+        """Все чтения запроса идут на одну реплику, миграции — мимо реплик"""
+        for _ in range(5):
+            response = self.view(self.factory.get('/'))
+            self.assertIn(
+                response.content.decode(), settings.DATABASE_REPLICAS
+            )
+        router = ReplicaRouter()
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+        self.assertFalse(router.allow_migrate('replica1', 'posts'))
+
+    def test_sticky_after_write(self):
+        """После записи браузер читает основную базу"""
+        user = User.objects.create_user(username='auth')
+        post = Post.objects.create(author=user, text='Тестовый пост')
+        self.client.force_login(user)
+        response = self.client.post(
+            f'/posts/{post.pk}/comment/', {'text': 'Комментарий'}
+        )
+        cookie = response.cookies[settings.REPLICA_STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        request = self.factory.get('/')
+        request.COOKIES[settings.REPLICA_STICKY_COOKIE] = cookie.value
+        self.assertEqual(self.view(request).content.decode(), 'default')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'PRAGMA SQLite')
+class SQLitePragmasTest(TestCase):
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -4000})
+    def test_pragmas_applied(self):
+        """Новое соединение получает PRAGMA из настроек"""
+        configure_sqlite(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -4000)
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_and_metrics(self):
+        """Замеры запроса видны в Server-Timing и на /metrics"""
+        response = self.client.get('/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        self.assertIn('page_miss=1', response['Server-Timing'])
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        content = response.content.decode()
+        self.assertIn(
+            'yatube_request_seconds_count{view="posts:index"}', content
+        )
+        self.assertIn(
+            'yatube_cache_events_total{event="page_miss",view="posts:index"}',
+            content
+        )
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+
+class PasswordHashersTest(TestCase):
+    def test_test_profile_uses_fast_hasher(self):
+        self.assertTrue(make_password('yatube').startswith('md5$'))
+
+    @override_settings(
+        PASSWORD_HASHERS=['core.hashers.TunedPBKDF2PasswordHasher'],
+        PBKDF2_ITERATIONS=1000
+    )
+    def test_cost_from_settings(self):
+        encoded = make_password('yatube')
+        self.assertEqual(encoded.split('$')[1], '1000')
+        self.assertTrue(check_password('yatube', encoded))
+        with self.settings(PBKDF2_ITERATIONS=2000):
+            # Хеш со старой стоимостью пересчитается при входе.
+            self.assertTrue(
+                TunedPBKDF2PasswordHasher().must_update(encoded)
+            )
+
+
+class FilesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp()
+        cls.name = 'cache/' + 'a' * 32 + '.txt'
+        os.makedirs(os.path.join(cls.root, 'cache'))
+        with open(os.path.join(cls.root, cls.name), 'wb') as stream:
+            stream.write(b'0123456789' * 200)
+        with open(os.path.join(cls.root, cls.name + '.gz'), 'wb') as stream:
+            stream.write(compression.compress(b'0123456789' * 200, 'gzip'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.root, ignore_errors=True)
+
+    def test_media_caching_and_ranges(self):
+        url = settings.MEDIA_URL + self.name
+        with self.settings(MEDIA_ROOT=self.root):
+            response = self.client.get(url)
+            self.assertEqual(b''.join(response.streaming_content)[:3], b'012')
+            self.assertIn('immutable', response['Cache-Control'])
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+            self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+            response = self.client.get(url, HTTP_RANGE='bytes=5-7')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join(response.streaming_content), b'567')
+            self.assertEqual(response['Content-Range'], 'bytes 5-7/2000')
+            response = self.client.get(url, HTTP_RANGE='bytes=5000-')
+            self.assertEqual(response.status_code, 416)
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Content-Type'], 'text/plain')
+            with self.settings(SENDFILE_HEADER='X-Accel-Redirect'):
+                response = self.client.get(url)
+            self.assertEqual(
+                response['X-Accel-Redirect'], '/internal' + url
+            )
+            with self.settings(SENDFILE_HEADER='X-Accel-Redirect'):
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(
+                response['X-Accel-Redirect'], '/internal' + url + '.gz'
+            )
+            with self.settings(SENDFILE_HEADER='X-Sendfile'):
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(
+                response['X-Sendfile'],
+                os.path.join(self.root, self.name) + '.gz'
+            )
+
+    def test_collectstatic_precompresses(self):
+        source = os.path.join(self.root, 'source')
+        target = os.path.join(self.root, 'collected')
+        os.makedirs(os.path.join(source, 'css'))
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as stream:
+            stream.write('body { margin: 0; }\n' * 200)
+        with self.settings(
+            STATICFILES_DIRS=[source],
+            STATIC_ROOT=target,
+            INSTALLED_APPS=['django.contrib.staticfiles'],
+            STATICFILES_STORAGE=(
+                'core.staticfiles.CompressedManifestStaticFilesStorage'
+            ),
+        ):
+            call_command('collectstatic', interactive=False, stdout=StringIO())
+        names = os.listdir(os.path.join(target, 'css'))
+        hashed = [
+            name for name in names
+            if name.startswith('site.') and name.endswith('.css')
+            and name != 'site.css'
+        ]
+        self.assertEqual(len(hashed), 1)
+        self.assertIn(hashed[0] + '.gz', names)
+        self.assertNotIn('site.css.gz', names)
+
+
+class CompressionTest(TestCase):
+    def test_gzip_response(self):
+        Post.objects.create(
+            author=User.objects.create_user(username='auth'),
+            text='Тестовый пост ' * 200
+        )
+        plain = self.client.get('/')
+        response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        response = self.client.get(
+            '/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=plain['ETag']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_collapse_whitespace(self):
+        source = '<div>\n    <p>a  b</p>\n\n  <pre>\n  x\n</pre>\n</div>'
+        self.assertEqual(
+            collapse_whitespace(source),
+            '<div>\n<p>a  b</p>\n<pre>\n  x\n</pre>\n</div>'
+        )
+
+
+class TemplateWarmUpTest(TestCase):
+    def test_warm_up_fills_cached_loader(self):
+        templates = copy.deepcopy(settings.TEMPLATES)
+        templates[0]['APP_DIRS'] = False
+        templates[0]['OPTIONS']['loaders'] = [(
+            'django.template.loaders.cached.Loader',
+            ['django.template.loaders.filesystem.Loader'],
+        )]
+        with self.settings(TEMPLATES=templates):
+            self.assertGreater(warm_up(), 0)
+            loader = engines.all()[0].engine.template_loaders[0]
+            self.assertIn('posts/index.html', {
+                template.origin.template_name
+                for template in loader.get_template_cache.values()
+            })
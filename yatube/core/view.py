@@ -1,5 +1,10 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from . import files, metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +20,32 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics_view(request):
+    """Метрики процесса в текстовом формате Prometheus."""
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+        raise PermissionDenied
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4'
+    )
+
+
+def static_file(request, path):
+    """Файлы из STATIC_ROOT; имена с хешем кешируются навсегда."""
+    if path in files.hashed_static():
+        return files.serve(
+            request, settings.STATIC_ROOT, path, settings.STATIC_MAX_AGE,
+            immutable=True
+        )
+    return files.serve(request, settings.STATIC_ROOT, path, 0)
+
+
+def media_file(request, path):
+    """Загруженные файлы; имена по хешу содержимого кешируются навсегда."""
+    if files.CONTENT_ADDRESSED.search(path):
+        return files.serve(
+            request, settings.MEDIA_ROOT, path, settings.MEDIA_MAX_AGE,
+            immutable=True
+        )
+    return files.serve(request, settings.MEDIA_ROOT, path, 0)
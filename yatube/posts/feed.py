@@ -0,0 +1,148 @@
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+
+from .models import FeedEntry, Follow, Post, ProfileStats, User
+
+
+def is_celebrity(author):
+    """Автор со слишком большим числом подписчиков для рассылки."""
+    return ProfileStats.objects.filter(
+        user=author,
+        followers_count__gte=settings.FEED_FANOUT_THRESHOLD
+    ).exists()
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= settings.FEED_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author):
+        return
+    followers = Follow.objects.filter(
+        author=post.author
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post=post)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill_follow(follow):
+    """Добавляет в ленту подписчика последние FEED_DEPTH постов автора."""
+    if is_celebrity(follow.author):
+        return
+    posts = Post.objects.filter(
+        author=follow.author
+    ).order_by('-pub_date', '-pk').values_list(
+        'pk', flat=True
+    )[:settings.FEED_DEPTH]
+    _bulk_insert(
+        FeedEntry(user=follow.user, post_id=post_id)
+        for post_id in posts.iterator()
+    )
+
+
+def reclassify(author_id, delta):
+    """Переводит автора между рассылкой и чтением напрямую.
+
+    Вызывается после сдвига счётчика подписчиков на delta. Перешедший
+    порог автор теряет материализованные записи: его посты дочитывает
+    follow_feed. Опустившийся ниже порога получает записи заново, в том
+    числе для постов, написанных без рассылки.
+    """
+    count = ProfileStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    ).first()
+    if count is None:
+        return
+    threshold = settings.FEED_FANOUT_THRESHOLD
+    previous = count - delta
+    if previous < threshold <= count:
+        FeedEntry.objects.filter(post__author_id=author_id).delete()
+    elif count < threshold <= previous:
+        rebuild(author_id=author_id)
+
+
+def remove_follow(follow):
+    """Убирает из ленты посты автора, от которого отписались."""
+    FeedEntry.objects.filter(
+        user=follow.user,
+        post__author=follow.author
+    ).delete()
+
+
+# Последние FEED_DEPTH постов каждого автора всем его подписчикам;
+# авторы с FEED_FANOUT_THRESHOLD и больше подписчиков пропускаются.
+FAN_OUT_SQL = '''
+    INSERT INTO posts_feedentry (user_id, post_id)
+    SELECT follow.user_id, recent.id
+    FROM posts_follow follow
+    JOIN (
+        SELECT id, author_id, ROW_NUMBER() OVER (
+            PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+        ) AS position
+        FROM posts_post
+        WHERE {authors}
+    ) recent ON recent.author_id = follow.author_id
+    WHERE recent.position <= %s
+    AND follow.author_id NOT IN (
+        SELECT author_id FROM posts_follow
+        GROUP BY author_id HAVING COUNT(*) >= %s
+    )
+    ORDER BY follow.user_id, recent.id
+'''
+
+
+def rebuild(author_id=None, using='default', depth=None):
+    """Заново раскладывает посты по лентам одним INSERT ... SELECT.
+
+    В ленту попадают последние depth (по умолчанию FEED_DEPTH) постов
+    каждого автора, поэтому записей не больше подписок * depth.
+    С author_id пересобираются только записи этого автора.
+    """
+    if depth is None:
+        depth = settings.FEED_DEPTH
+    delete = 'DELETE FROM posts_feedentry'
+    authors, params = '1 = 1', []
+    if author_id is not None:
+        delete += (
+            ' WHERE post_id IN'
+            ' (SELECT id FROM posts_post WHERE author_id = %s)'
+        )
+        authors, params = 'author_id = %s', [author_id]
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(delete, params)
+            cursor.execute(
+                FAN_OUT_SQL.format(authors=authors),
+                params + [depth, settings.FEED_FANOUT_THRESHOLD]
+            )
+
+
+def follow_feed(user):
+    """Лента подписок: материализованные записи плюс посты знаменитостей.
+
+    Посты авторов, у которых подписчиков не меньше
+    FEED_FANOUT_THRESHOLD, не раскладываются по лентам при публикации
+    и дочитываются здесь напрямую.
+    """
+    celebrities = list(User.objects.filter(
+        stats__followers_count__gte=settings.FEED_FANOUT_THRESHOLD,
+        following__user=user
+    ).values_list('pk', flat=True))
+    if not celebrities:
+        return Post.objects.filter(feed_entries__user=user)
+    return Post.objects.filter(
+        Q(pk__in=FeedEntry.objects.filter(user=user).values('post_id'))
+        | Q(author__in=celebrities)
+    )
@@ -1,5 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
 
+from .images import ingest
 from .models import Post, Comment
 
 
@@ -16,6 +19,30 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относиться пост'
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            try:
+                image, width, height = ingest(image)
+            except (
+                OSError, ValueError, Image.DecompressionBombError
+            ) as error:
+                raise forms.ValidationError(
+                    'Не удалось обработать изображение: файл повреждён '
+                    'или слишком велик.',
+                    code='invalid_image'
+                ) from error
+            size = image.size
+        elif not image:
+            width = height = size = None
+        else:
+            # Картинка не менялась.
+            return image
+        self.instance.image_width = width
+        self.instance.image_height = height
+        self.instance.image_bytes = size
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
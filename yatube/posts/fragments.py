@@ -0,0 +1,54 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import metrics
+
+from . import page_cache
+
+CARD_TEMPLATE = 'posts/includes/post_list.html'
+
+
+def _card_key(post, group, site):
+    # В ключ входит всё, что рисует карточка, поэтому правка поста,
+    # новый комментарий или смена имени автора дают новый ключ;
+    # версия сайта сбрасывает все карточки после импорта.
+    raw = '|'.join(map(str, (
+        site,
+        post.updated_at.timestamp(),
+        getattr(post, 'comment_count', ''),
+        post.author.username,
+        post.author.get_full_name(),
+        post.group.slug if post.group else '',
+        post.group.title if post.group else '',
+        group is None,
+    )))
+    return f'post-card:{post.pk}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def attach_cards(posts, group=None):
+    """Кладёт в post.card готовую карточку каждого поста страницы.
+
+    Все карточки страницы достаются из кеша одним get_many после
+    чтения версии сайта, отсутствующие рендерятся и сохраняются
+    одним set_many.
+    """
+    posts = list(posts)
+    site = page_cache.get_versions([page_cache.SITE_SCOPE])[0]
+    keys = {post.pk: _card_key(post, group, site) for post in posts}
+    cards = cache.get_many(keys.values())
+    missing = {}
+    for post in posts:
+        key = keys[post.pk]
+        if key not in cards:
+            cards[key] = missing[key] = render_to_string(
+                CARD_TEMPLATE, {'post': post, 'group': group}
+            )
+        post.card = mark_safe(cards[key])
+    metrics.event('card_hit', len(posts) - len(missing))
+    metrics.event('card_miss', len(missing))
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_TIMEOUT)
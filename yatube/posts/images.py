@@ -0,0 +1,115 @@
+import math
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps, ImageSequence
+
+# PNG и GIF остаются в своём формате: в них прозрачность и рисунки,
+# которые в JPEG выходят и хуже, и тяжелее.
+KEEP_FORMATS = ('PNG', 'GIF')
+ALPHA_MODES = ('RGBA', 'LA', 'PA')
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif'}
+
+
+def _draft(image, max_size):
+    # JPEG декодируется сразу в 1/2, 1/4 или 1/8 размера, и полный
+    # оригинал не распаковывается в память.
+    width, height = image.size
+    scale = max_size / max(width, height)
+    if scale < 1:
+        image.draft(
+            None, (math.ceil(width * scale), math.ceil(height * scale))
+        )
+
+
+def _output_format(image, source_format):
+    if source_format in KEEP_FORMATS:
+        return source_format
+    if image.mode in ALPHA_MODES or 'transparency' in image.info:
+        return 'PNG'
+    return 'JPEG'
+
+
+def _animation(image, max_size):
+    # Кадры уменьшаются по отдельности и собираются в GIF заново,
+    # info очищается: иначе Pillow допишет комментарии исходника.
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get('duration', 100))
+        frame = frame.convert('RGBA')
+        frame.info = {}
+        if max(frame.size) > max_size:
+            frame.thumbnail((max_size, max_size), Image.LANCZOS)
+        frames.append(frame)
+    output = BytesIO()
+    frames[0].save(
+        output,
+        'GIF',
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=image.info.get('loop', 0),
+        disposal=2
+    )
+    return output, frames[0]
+
+
+def _uploaded(upload, output, image_format):
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    return SimpleUploadedFile(
+        f'{stem}.{EXTENSIONS[image_format]}',
+        output.getvalue(),
+        f'image/{image_format.lower()}'
+    )
+
+
+def ingest(upload):
+    """Готовит загруженную картинку к хранению.
+
+    Уменьшает до POST_IMAGE_MAX_SIZE по большей стороне, поворачивает
+    по EXIF и перекодирует без метаданных; фото сохраняются
+    прогрессивным JPEG. Возвращает (файл, ширина, высота).
+    Анимации уменьшаются покадрово и сохраняются в GIF. Битые
+    и слишком большие файлы поднимают OSError, ValueError или
+    Image.DecompressionBombError.
+    """
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    upload.seek(0)
+    # Pillow читает файл по мере декодирования, а большие загрузки
+    # Django уже держит во временном файле, а не в памяти.
+    image = Image.open(upload)
+    source_format = image.format
+    if getattr(image, 'is_animated', False):
+        output, image = _animation(image, max_size)
+        return (_uploaded(upload, output, 'GIF'),) + image.size
+    if source_format == 'JPEG':
+        _draft(image, max_size)
+    image = ImageOps.exif_transpose(image)
+    if max(image.size) > max_size:
+        # reducing_gap сначала сжимает картинку в целое число раз
+        # через reduce(), а LANCZOS работает уже с малой копией.
+        image.thumbnail((max_size, max_size), Image.LANCZOS, reducing_gap=3)
+    image_format = _output_format(image, source_format)
+    output = BytesIO()
+    if image_format == 'JPEG':
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.save(
+            output,
+            'JPEG',
+            quality=settings.POST_IMAGE_QUALITY,
+            optimize=True,
+            progressive=True
+        )
+    else:
+        # PNG берёт EXIF и текстовые блоки из info, поэтому от info
+        # остаётся только прозрачность.
+        keep = {
+            name: image.info[name]
+            for name in ('transparency',) if name in image.info
+        }
+        image.info = {}
+        image.save(output, image_format, optimize=True, **keep)
+    return _uploaded(upload, output, image_format), image.width, image.height
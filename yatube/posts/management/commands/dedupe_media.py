@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from posts import page_cache, storage, thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов в хранилище по хешу содержимого: '
+        'одинаковые файлы остаются в одном экземпляре.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать, ничего не меняя.'
+        )
+
+    def handle(self, *args, **options):
+        counters, moved = storage.dedupe(options['dry_run'])
+        self.stdout.write(
+            f'Перенесено файлов: {counters["moved"]}, '
+            f'удалено повторов: {counters["removed"]}, '
+            f'освобождено байт: {counters["freed"]}, '
+            f'не найдено: {counters["missing"]}'
+        )
+        if options['dry_run'] or not moved:
+            return
+        # У файлов новые имена: миниатюры создаются по одной на файл,
+        # а закешированные страницы ссылаются на старые адреса.
+        for post_id in moved.values():
+            thumbnails.generate(post_id)
+        page_cache.bump_site()
+        self.stdout.write(self.style.SUCCESS('Повторы картинок удалены'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает группы, посты, комментарии и подписки '
+        'в NDJSON или CSV. Файлы картинок не копируются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=sorted(transfer.WRITERS), default='ndjson'
+        )
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='Файл для выгрузки; по умолчанию stdout.'
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        write = transfer.WRITERS[options['format']]
+        rows = transfer.export_rows(options['batch_size'])
+        if options['output'] == '-':
+            count = write(rows, self.stdout)
+            # stdout занят данными, итог уходит в stderr.
+            self.stderr.write(f'Выгружено строк: {count}', lambda msg: msg)
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as stream:
+            count = write(rows, stream)
+        self.stdout.write(f'Выгружено строк: {count}')
@@ -0,0 +1,46 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_posts пачками bulk_create и '
+        'пересчитывает счётчики, ленты и поисковый индекс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки или - для stdin.')
+        parser.add_argument(
+            '--format',
+            choices=sorted(transfer.READERS),
+            help='По умолчанию определяется по расширению файла.'
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        data_format = options['format']
+        if data_format is None:
+            extension = os.path.splitext(path)[1].lstrip('.')
+            data_format = extension if extension in transfer.READERS else (
+                'ndjson'
+            )
+        read = transfer.READERS[data_format]
+        if path == '-':
+            counts = self.load(read(sys.stdin), options['batch_size'])
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                counts = self.load(read(stream), options['batch_size'])
+        for name, count in counts.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена'))
+
+    def load(self, rows, batch_size):
+        try:
+            return transfer.import_rows(rows, batch_size)
+        except (ValueError, KeyError) as error:
+            raise CommandError(f'Битая выгрузка: {error}')
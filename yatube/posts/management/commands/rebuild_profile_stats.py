@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, подписок и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только показать расхождения, ничего не меняя.'
+        )
+
+    def handle(self, *args, **options):
+        drifted = stats.drifted().count()
+        self.stdout.write(f'Расходящихся профилей: {drifted}')
+        if options['check']:
+            return
+        stats.rebuild()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
@@ -0,0 +1,248 @@
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from posts import transfer
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Быстро заполняет базу синтетическими пользователями, группами, '
+        'постами, комментариями и подписками для нагрузочных замеров. '
+        'На SQLite миллион постов вставляется примерно за 45 с, '
+        'но счётчики, ленты и поиск строятся ещё около 105 с '
+        '(на 100k постов: 7,5 с и 35 с). В минуту укладывается '
+        'только заполнение с --skip-derived.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--follows', type=int, default=100000)
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.2,
+            help='Показатель степенного закона для популярности авторов.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365, help='Глубина дат постов.'
+        )
+        parser.add_argument(
+            '--password',
+            default='yatube',
+            help='Общий пароль: хеш считается один раз на всех.'
+        )
+        parser.add_argument('--batch-size', type=int, default=20000)
+        parser.add_argument(
+            '--skip-derived',
+            action='store_true',
+            help='Не строить счётчики, ленты и поиск: только строки. '
+                 'Производные данные занимают в 2-5 раз больше '
+                 'времени, чем сами строки.'
+        )
+        parser.add_argument(
+            '--feed-depth',
+            type=int,
+            default=None,
+            help='Сколько последних постов автора класть в ленты '
+                 '(по умолчанию FEED_DEPTH).'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        fake = Faker('ru_RU')
+        fake.seed_instance(options['seed'])
+        # Тексты собираются из заранее сгенерированных фраз: Faker
+        # на каждый из миллиона постов занял бы большую часть времени.
+        self.phrases = [fake.sentence() for _ in range(2000)]
+        self.now = timezone.now()
+        self.days = options['days']
+        started = time.perf_counter()
+        self.tune_sqlite()
+        with transfer.keep_dates():
+            users = self.create_users(options['users'], options['password'])
+            groups = self.create_groups(options['groups'])
+            # Одни и те же авторы пишут чаще и собирают больше
+            # подписчиков: веса рангов по степенному закону.
+            weights = list(accumulate(
+                1 / rank ** options['alpha']
+                for rank in range(1, len(users) + 1)
+            ))
+            posts = self.create_posts(
+                options['posts'], users, weights, groups
+            )
+            self.create_comments(options['comments'], posts, users)
+            self.create_follows(options['follows'], users, weights)
+        self.report('Строки', started)
+        started = time.perf_counter()
+        transfer.finish_import(
+            derived=not options['skip_derived'],
+            feed_depth=options['feed_depth']
+        )
+        if not options['skip_derived']:
+            self.report('Счётчики, ленты и поиск', started)
+
+    def tune_sqlite(self):
+        # Индексы постов не помещаются в кеш SQLite по умолчанию (2 МБ),
+        # и вставка упирается в диск. Настройки действуют только
+        # на соединение этой команды.
+        if connection.vendor != 'sqlite' or connection.in_atomic_block:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size = -1048576')
+            cursor.execute('PRAGMA temp_store = MEMORY')
+            cursor.execute('PRAGMA synchronous = OFF')
+
+    def report(self, stage, started):
+        self.stdout.write(
+            f'{stage}: {time.perf_counter() - started:.1f} с'
+        )
+
+    def next_ids(self, model, count):
+        start = (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        return range(start, start + count)
+
+    def batches(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def save(self, model, objects):
+        """bulk_create пачками по batch_size, по транзакции на пачку."""
+        for batch in self.batches(objects):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+
+    def insert(self, model, fields, rows):
+        """Вставляет кортежи значений через executemany.
+
+        Для миллионов строк bulk_create упирается в подготовку каждого
+        значения каждого экземпляра модели; здесь строки сразу
+        собираются в нужном базе виде, пачками по транзакции.
+        """
+        columns = [model._meta.get_field(field).column for field in fields]
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(model._meta.db_table),
+            ', '.join(map(connection.ops.quote_name, columns)),
+            ', '.join(['%s'] * len(columns))
+        )
+        for batch in self.batches(rows):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+
+    def text(self, sentences):
+        return ' '.join(self.random.choices(self.phrases, k=sentences))
+
+    def dates(self, count):
+        """count дат по возрастанию в пределах --days.
+
+        Строки вставляются в порядке дат, как если бы их публиковали
+        по очереди: индексы по pub_date растут с конца, а не вразброс.
+        """
+        span = self.days * 24 * 60 * 60
+        adapt = connection.ops.adapt_datetimefield_value
+        start = self.now - timedelta(seconds=span)
+        for offset in sorted(
+            self.random.randrange(span) for _ in range(count)
+        ):
+            yield adapt(start + timedelta(seconds=offset))
+
+    def create_users(self, count, password):
+        ids = self.next_ids(User, count)
+        password = make_password(password)
+        self.save(User, (
+            User(pk=pk, username=f'user{pk}', password=password)
+            for pk in ids
+        ))
+        return ids
+
+    def create_groups(self, count):
+        ids = self.next_ids(Group, count)
+        self.save(Group, (
+            Group(
+                pk=pk,
+                title=f'Группа {pk}',
+                slug=f'group-{pk}',
+                description=self.text(2)
+            )
+            for pk in ids
+        ))
+        return ids
+
+    def create_posts(self, count, users, weights, groups):
+        ids = self.next_ids(Post, count)
+        authors = self.random.choices(users, cum_weights=weights, k=count)
+        now = connection.ops.adapt_datetimefield_value(self.now)
+        self.insert(
+            Post,
+            ('id', 'author', 'group', 'text', 'pub_date', 'updated_at',
+             'image'),
+            (
+                (
+                    pk,
+                    author_id,
+                    self.random.choice(groups)
+                    if groups and self.random.random() < 0.5 else None,
+                    self.text(self.random.randint(1, 5)),
+                    pub_date,
+                    now,
+                    '',
+                )
+                for pk, author_id, pub_date in zip(
+                    ids, authors, self.dates(count)
+                )
+            )
+        )
+        return ids
+
+    def create_comments(self, count, posts, users):
+        if not posts:
+            return
+        self.insert(
+            Comment,
+            ('post', 'author', 'text', 'created'),
+            (
+                (
+                    self.random.choice(posts),
+                    self.random.choice(users),
+                    self.text(1),
+                    created,
+                )
+                for created in self.dates(count)
+            )
+        )
+
+    def create_follows(self, count, users, weights):
+        # Подписчик выбирается равномерно, автор — по степенному закону,
+        # поэтому у немногих авторов тысячи подписчиков.
+        count = min(count, len(users) * (len(users) - 1))
+        pairs = set()
+        while len(pairs) < count:
+            for user_id, author_id in zip(
+                self.random.choices(users, k=count),
+                self.random.choices(users, cum_weights=weights, k=count)
+            ):
+                if user_id != author_id:
+                    pairs.add((user_id, author_id))
+                if len(pairs) >= count:
+                    break
+        self.insert(Follow, ('user', 'author'), pairs)
@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Копия posts.feed.FAN_OUT_SQL на момент миграции: живой код может
+# измениться, а миграция должна воспроизводиться как есть.
+FILL_FEED_SQL = '''
+    INSERT INTO posts_feedentry (user_id, post_id)
+    SELECT follow.user_id, recent.id
+    FROM posts_follow follow
+    JOIN (
+        SELECT id, author_id, ROW_NUMBER() OVER (
+            PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+        ) AS position
+        FROM posts_post
+    ) recent ON recent.author_id = follow.author_id
+    WHERE recent.position <= %s
+    AND follow.author_id NOT IN (
+        SELECT author_id FROM posts_follow
+        GROUP BY author_id HAVING COUNT(*) >= %s
+    )
+    ORDER BY follow.user_id, recent.id
+'''
+
+
+def fill_feed(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(FILL_FEED_SQL, [
+            getattr(settings, 'FEED_DEPTH', 200),
+            getattr(settings, 'FEED_FANOUT_THRESHOLD', 1000),
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0008_auto_20230504_1639'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_profile_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    ProfileStats = apps.get_model('posts', 'ProfileStats')
+    users = User.objects.annotate(
+        posts=models.Count('author_posts', distinct=True),
+        followers=models.Count('following', distinct=True),
+        followings=models.Count('follower', distinct=True),
+        user_comments=models.Count('comments', distinct=True),
+    ).values_list('pk', 'posts', 'followers', 'followings', 'user_comments')
+    ProfileStats.objects.bulk_create(
+        (
+            ProfileStats(
+                user_id=pk,
+                posts_count=posts,
+                followers_count=followers,
+                following_count=followings,
+                comments_count=user_comments,
+            )
+            for pk, posts, followers, followings, user_comments
+            in users.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+        ),
+        migrations.RunPython(fill_profile_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:20
+
+from django.conf import settings
+from django.db import migrations
+
+SQLITE_FORWARD = (
+    "CREATE VIRTUAL TABLE posts_search USING fts5("
+    "body, post_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO posts_search (rowid, body, post_id) "
+    "SELECT id * 2, text, id FROM posts_post",
+    "INSERT INTO posts_search (rowid, body, post_id) "
+    "SELECT id * 2 + 1, text, post_id FROM posts_comment",
+)
+
+# Строки с %s получают имя конфигурации SEARCH_CONFIG.
+POSTGRESQL_FORWARD = (
+    "CREATE TABLE posts_search ("
+    "id bigint PRIMARY KEY, post_id integer NOT NULL, "
+    "body text NOT NULL, document tsvector NOT NULL)",
+    "CREATE INDEX posts_search_document ON posts_search USING GIN (document)",
+    "INSERT INTO posts_search (id, post_id, body, document) "
+    "SELECT id * 2, id, text, to_tsvector(%s::regconfig, text) "
+    "FROM posts_post",
+    "INSERT INTO posts_search (id, post_id, body, document) "
+    "SELECT id * 2 + 1, post_id, text, "
+    "to_tsvector(%s::regconfig, text) FROM posts_comment",
+)
+
+FORWARD = {
+    'sqlite': SQLITE_FORWARD,
+    'postgresql': POSTGRESQL_FORWARD,
+}
+
+
+def create_search_index(apps, schema_editor):
+    statements = FORWARD.get(schema_editor.connection.vendor, ())
+    for statement in statements:
+        params = [settings.SEARCH_CONFIG] * statement.count('%s')
+        schema_editor.execute(statement, params)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in FORWARD:
+        schema_editor.execute('DROP TABLE posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,9 +1,45 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def with_comment_count(self):
+        """Добавляет comment_count одним подзапросом."""
+        comment_count = Comment.objects.filter(
+            post=OuterRef('pk')
+        ).order_by().values('post').annotate(
+            count=Count('pk')
+        ).values('count')
+        return self.annotate(
+            comment_count=Coalesce(
+                Subquery(comment_count, output_field=models.IntegerField()),
+                0
+            )
+        )
+
+    def for_feed(self):
+        """Посты с тем, что рисует карточка в ленте, без N+1 запросов."""
+        return self.select_related('author', 'group').only(
+            'text',
+            'pub_date',
+            'updated_at',
+            'image',
+            'author',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'group',
+            'group__slug',
+            'group__title',
+        ).with_comment_count()
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -13,6 +49,10 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -31,11 +71,41 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    # Заполняются при загрузке (posts.images.ingest), а не через
+    # width_field: тот открывает файл картинки при чтении поста.
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, editable=False
+    )
+    image_bytes = models.PositiveIntegerField(
+        'Размер картинки в байтах', null=True, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        # Ленты сортируются по (pub_date, id) по убыванию: индексы
+        # читаются в обратном порядке и отдают строки без сортировки.
+        indexes = [
+            models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', 'pub_date', 'id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=['pub_date', 'id'],
+                name='post_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         # выводим текст поста
@@ -82,6 +152,14 @@ class Comment(models.Model):
         # выводим текст поста
         return self.text[:15]
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx',
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -111,3 +189,56 @@ class Follow(models.Model):
                 name='not_self',
             )
         ]
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry',
+            ),
+        ]
+
+
+class ProfileStats(models.Model):
+    """Денормализованные счётчики профиля пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class MediaFile(models.Model):
+    """Число постов, ссылающихся на файл в ContentAddressedStorage."""
+    name = models.CharField('Файл', max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField('Ссылок', default=0)
+
+    def __str__(self):
+        return self.name
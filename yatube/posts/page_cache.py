@@ -0,0 +1,273 @@
+import hashlib
+import time
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from core import metrics
+
+from .models import Post
+
+VERSION_KEY = 'page-version:{}'
+MODIFIED_KEY = 'page-modified:{}'
+PAGE_KEY = 'page:{}:{}'
+LOCK_KEY = 'page-lock:{}'
+AUTHOR_KEY = 'post-author:{}'
+# Область, от которой зависит каждая страница, карточка и автор поста:
+# её bump сбрасывает всё кешированное этим сайтом, не трогая чужие
+# ключи в общем бэкенде.
+SITE_SCOPE = 'site'
+
+# Попадания и промахи кеша страниц в этом процессе.
+counters = Counter()
+
+
+def _count(event):
+    counters[event] += 1
+    metrics.event(f'page_{event}')
+
+
+def _initial_version():
+    # Начальная версия берётся от времени, чтобы после очистки кеша
+    # новые ключи не совпали со старыми.
+    return int(time.time() * 1000)
+
+
+def _version_key(scope):
+    # В slug и username бывают символы, недопустимые в ключах memcached.
+    return VERSION_KEY.format(hashlib.md5(scope.encode()).hexdigest())
+
+
+def _modified_key(scope):
+    return MODIFIED_KEY.format(hashlib.md5(scope.encode()).hexdigest())
+
+
+def get_versions(scopes):
+    """Текущие версии областей кеша в порядке scopes."""
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time()
+        for scope, key in zip(scopes, keys):
+            if key in missing:
+                cache.add(key, _initial_version(), None)
+                # Раньше первой выдачи версии страницу никто не видел.
+                cache.add(_modified_key(scope), now, None)
+        versions.update(cache.get_many(missing))
+    return [str(versions.get(key, 0)) for key in keys]
+
+
+def bump(*scopes):
+    """Инвалидирует все страницы, зависящие от scopes."""
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), None)
+    now = time.time()
+    cache.set_many({_modified_key(scope): now for scope in scopes}, None)
+
+
+def bump_site():
+    """Инвалидирует все страницы и карточки после массовых правок."""
+    bump(SITE_SCOPE)
+
+
+def post_scopes(post):
+    """Области кеша, на страницах которых виден пост."""
+    scopes = ['index', f'post:{post.pk}', f'profile:{post.author.username}']
+    if post.group_id:
+        scopes.append(f'group:{post.group.slug}')
+    return scopes
+
+
+def post_author(post_id):
+    """Имя автора поста для областей кеша, без запроса к базе.
+
+    Запись живёт PAGE_CACHE_TIMEOUT, чтобы переименование
+    пользователя всё же дошло до областей, и сбрасывается bump_site().
+    Версия сайта читается тем же get_many, что и запись.
+    """
+    key = AUTHOR_KEY.format(post_id)
+    site_key = _version_key(SITE_SCOPE)
+    entries = cache.get_many([key, site_key])
+    entry = entries.get(key)
+    if entry is not None and entry[0] == entries.get(site_key):
+        return entry[1]
+    author = Post.objects.filter(pk=post_id).values_list(
+        'author__username', flat=True
+    ).first()
+    if author is not None:
+        site = get_versions([SITE_SCOPE])[0]
+        cache.set(key, (int(site), author), settings.PAGE_CACHE_TIMEOUT)
+    return author
+
+
+def _scopes(request, scopes, kwargs):
+    # ETag, Last-Modified и кеш страницы спрашивают области у одного
+    # запроса; функция областей может ходить в базу, поэтому один раз.
+    memo = request.__dict__.setdefault('_page_scopes', {})
+    if scopes not in memo:
+        memo[scopes] = [SITE_SCOPE, *scopes(**kwargs)]
+    return memo[scopes]
+
+
+def etag(scopes):
+    """etag_func для condition(): версии областей плюс адрес запроса.
+
+    Не трогает базу, поэтому ответ 304 стоит одного обращения к кешу.
+    """
+    def etag_func(request, *args, **kwargs):
+        raw = '|'.join((
+            ':'.join(get_versions(_scopes(request, scopes, kwargs))),
+            request.get_full_path(),
+            _variant(request),
+        ))
+        return hashlib.md5(raw.encode()).hexdigest()
+    return etag_func
+
+
+def last_modified(scopes):
+    """last_modified_func для condition(): время последнего bump.
+
+    Только для анонимов: страница пользователя меняется и без bump
+    (вход, выход), а ETag учитывает это через вариант.
+    """
+    def last_modified_func(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        keys = [
+            _modified_key(scope)
+            for scope in _scopes(request, scopes, kwargs)
+        ]
+        stamps = cache.get_many(keys)
+        if len(stamps) < len(keys):
+            return None
+        return datetime.fromtimestamp(max(stamps.values()), timezone.utc)
+    return last_modified_func
+
+
+def conditional_page(scopes):
+    """Отвечает 304 на повторный GET, если области не менялись.
+
+    ETag и Last-Modified берутся из кеша версий, без запросов к базе
+    и рендеринга. no-cache заставляет браузер и CDN сверяться при
+    каждом показе, а не держать страницу по эвристике. Устаревшая
+    страница из cached_page уходит без валидаторов: они описывают
+    новую версию, и 304 по ним закрепил бы старое содержимое.
+    """
+    def decorator(view):
+        conditional = condition(
+            etag_func=etag(scopes), last_modified_func=last_modified(scopes)
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            if getattr(response, 'page_stale', False):
+                del response['ETag']
+                del response['Last-Modified']
+            if request.method in ('GET', 'HEAD'):
+                directives = {'no_cache': True}
+                if request.user.is_authenticated:
+                    directives['private'] = True
+                patch_cache_control(response, **directives)
+            return response
+        return wrapper
+    return decorator
+
+
+def _variant(request):
+    if not request.user.is_authenticated:
+        return 'anon'
+    # В странице зашит CSRF-токен, поэтому вариант привязан к cookie.
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return f'user:{request.user.pk}:{csrf}'
+
+
+def _base_key(request, view_name, kwargs):
+    raw = '|'.join((
+        view_name,
+        repr(sorted(kwargs.items())),
+        request.GET.urlencode(),
+        _variant(request),
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _wait_for(key):
+    """Ждёт, пока страницу посчитает запрос, взявший блокировку."""
+    deadline = time.time() + settings.PAGE_CACHE_LOCK_WAIT
+    while time.time() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def cached_page(scopes, timeout=None):
+    """Кеширует GET-ответ view с ключом из версий областей scopes.
+
+    scopes получает именованные аргументы view и возвращает список
+    областей. Изменение данных сдвигает версию области (bump), так что
+    страницы можно держать в кеше долго без устаревания. После
+    мягкого истечения срока ответ пересчитывает один запрос под
+    блокировкой, остальные получают последнюю сохранённую версию.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            page_timeout = timeout or settings.PAGE_CACHE_TIMEOUT
+            base = _base_key(request, view.__name__, kwargs)
+            versions = ':'.join(
+                get_versions(_scopes(request, scopes, kwargs))
+            )
+            key = PAGE_KEY.format(base, versions)
+            latest_key = PAGE_KEY.format(base, 'latest')
+            entries = cache.get_many([key, latest_key])
+            entry = entries.get(key)
+            now = time.time()
+            if entry is not None and entry[0] > now:
+                _count('hit')
+                return entry[1]
+            stale = entry or entries.get(latest_key)
+            lock_key = LOCK_KEY.format(base)
+            locked = cache.add(
+                lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT
+            )
+            if not locked and stale is not None:
+                _count('stale')
+                response = stale[1]
+                response.page_stale = True
+                return response
+            if not locked:
+                entry = _wait_for(key)
+                if entry is not None:
+                    _count('hit')
+                    return entry[1]
+            _count('miss')
+            try:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    entry = (now + page_timeout, response)
+                    cache.set_many(
+                        {key: entry, latest_key: entry},
+                        page_timeout * 2
+                    )
+            finally:
+                if locked:
+                    cache.delete(lock_key)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,133 @@
+import base64
+import binascii
+
+from django.core.paginator import (
+    EmptyPage, Page, PageNotAnInteger, Paginator
+)
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def encode_cursor(direction, date, pk):
+    """Упаковывает позицию в ленте в непрозрачный токен для ?cursor=."""
+    raw = f'{direction}|{date.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (направление, дата, id) или None для битого токена."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, date, pk = raw.decode().split('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or date is None:
+        return None
+    return direction, date, pk
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор по паре (дата, id).
+
+    Вместо OFFSET страница выбирается условием
+    «(дата, id) меньше курсора», поэтому глубокие страницы
+    стоят столько же, сколько первая, а COUNT(*) не нужен.
+    Обычный get_page() остаётся доступен для старых ссылок ?page=N.
+    С ascending=True лента идёт от старых записей к новым.
+    """
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 count_limit=None, ascending=False, **kwargs):
+        self.date_field = date_field
+        self.count_limit = count_limit
+        self.ascending = ascending
+        if ascending:
+            object_list = object_list.order_by(date_field, 'pk')
+        else:
+            object_list = object_list.order_by(f'-{date_field}', '-pk')
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        """Число объектов; с count_limit считается не дальше лимита."""
+        if self.count_limit is None:
+            return super().count
+        return self.object_list[:self.count_limit].count()
+
+    @property
+    def count_is_approximate(self):
+        return (
+            self.count_limit is not None
+            and self.count >= self.count_limit
+        )
+
+    def number_page(self, number):
+        """Страница по номеру для старых ссылок ?page=N.
+
+        Нечисловой номер даёт первую страницу, как get_page(), а номер
+        за последней страницей поднимает EmptyPage: под чужим номером
+        не отдаётся последняя страница. При приблизительном счёте
+        num_pages обрезан count_limit, поэтому номер за ним читается
+        из базы, и EmptyPage поднимается, только если строк нет.
+        """
+        try:
+            return self.page(number)
+        except PageNotAnInteger:
+            return self.page(1)
+        except EmptyPage:
+            if not self.count_is_approximate or int(number) < 1:
+                raise
+        number = int(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page])
+        if not rows:
+            raise EmptyPage('That page contains no results')
+        return self._get_page(rows, number, self)
+
+    def _key(self, obj):
+        # Строки из values() приходят словарями.
+        if isinstance(obj, dict):
+            return obj[self.date_field], obj['pk']
+        return getattr(obj, self.date_field), obj.pk
+
+    def cursor_page(self, cursor=None):
+        """Возвращает страницу после (или до) позиции из токена."""
+        position = decode_cursor(cursor) if cursor else None
+        queryset = self.object_list
+        direction = FORWARD
+        if position is not None:
+            direction, date, pk = position
+            # Вперёд по убывающей ленте — значит к меньшим ключам.
+            lookup = 'lt' if (direction == FORWARD) != self.ascending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.date_field}__{lookup}': date})
+                | Q(**{self.date_field: date, f'pk__{lookup}': pk})
+            )
+            if direction == BACKWARD:
+                queryset = queryset.reverse()
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == BACKWARD:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        # Номер страницы при keyset-пагинации не вычисляется.
+        page = Page(rows, 1, self)
+        page.cursor_mode = True
+        page.next_cursor = None
+        page.previous_cursor = None
+        if rows and has_next:
+            page.next_cursor = encode_cursor(FORWARD, *self._key(rows[-1]))
+        if rows and has_previous:
+            page.previous_cursor = encode_cursor(
+                BACKWARD, *self._key(rows[0])
+            )
+        return page
@@ -0,0 +1,270 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.db import connections, router
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+# Посты и комментарии живут в одной таблице индекса; rowid кодирует
+# тип записи в младшем бите, чтобы обновлять строку по первичному ключу.
+POST, COMMENT = 0, 1
+
+# Управляющие символы не встречаются в тексте и не экранируются,
+# поэтому ими помечаются совпадения до escape().
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+def row_id(kind, pk):
+    return pk * 2 + kind
+
+
+def encode_cursor(rank, rowid):
+    raw = f'{rank!r}|{rowid}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        rank, rowid = raw.decode().split('|')
+        return float(rank), int(rowid)
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def highlight(snippet):
+    """Экранирует фрагмент текста и выделяет совпадения тегом <mark>."""
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+class Hit:
+    """Найденный пост или комментарий."""
+
+    def __init__(self, rowid, post_id, snippet, rank):
+        self.kind = rowid % 2
+        self.object_id = rowid // 2
+        self.post_id = post_id
+        self.snippet = highlight(snippet)
+        self.rank = rank
+        self.rowid = rowid
+        self.post = None
+
+    @property
+    def is_comment(self):
+        return self.kind == COMMENT
+
+
+class SQLiteBackend:
+    """Индекс на виртуальной таблице FTS5 с ранжированием bm25."""
+
+    def save(self, cursor, rowid, post_id, text):
+        cursor.execute('DELETE FROM posts_search WHERE rowid = %s', [rowid])
+        cursor.execute(
+            'INSERT INTO posts_search (rowid, body, post_id) '
+            'VALUES (%s, %s, %s)',
+            [rowid, text, post_id]
+        )
+
+    def delete(self, cursor, rowid):
+        cursor.execute('DELETE FROM posts_search WHERE rowid = %s', [rowid])
+
+    def rebuild(self, cursor):
+        cursor.execute('DELETE FROM posts_search')
+        cursor.execute(
+            'INSERT INTO posts_search (rowid, body, post_id) '
+            'SELECT id * 2, text, id FROM posts_post'
+        )
+        cursor.execute(
+            'INSERT INTO posts_search (rowid, body, post_id) '
+            'SELECT id * 2 + 1, text, post_id FROM posts_comment'
+        )
+
+    def match(self, query):
+        # Каждое слово берётся в кавычки, чтобы пользовательский ввод
+        # не разбирался как синтаксис запросов FTS5.
+        return ' '.join(
+            '"{}"'.format(word.replace('"', '""')) for word in query.split()
+        )
+
+    def search(self, cursor, query, after, limit):
+        sql = (
+            'SELECT rowid, post_id, snippet(posts_search, 0, %s, %s, '
+            "'…', 16), rank FROM posts_search WHERE posts_search MATCH %s"
+        )
+        params = [MARK_START, MARK_END, self.match(query)]
+        if after is not None:
+            sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY rank, rowid LIMIT %s'
+        cursor.execute(sql, params + [limit])
+        return cursor.fetchall()
+
+    def post_ids(self, query):
+        return (
+            'SELECT rowid / 2 FROM posts_search '
+            'WHERE posts_search MATCH %s AND rowid %% 2 = 0',
+            [self.match(query)]
+        )
+
+
+class PostgreSQLBackend:
+    """Индекс на tsvector с GIN-индексом и ранжированием ts_rank."""
+
+    def save(self, cursor, rowid, post_id, text):
+        cursor.execute(
+            'INSERT INTO posts_search (id, post_id, body, document) '
+            'VALUES (%s, %s, %s, to_tsvector(%s::regconfig, %s)) '
+            'ON CONFLICT (id) DO UPDATE SET '
+            'body = EXCLUDED.body, document = EXCLUDED.document',
+            [rowid, post_id, text, settings.SEARCH_CONFIG, text]
+        )
+
+    def delete(self, cursor, rowid):
+        cursor.execute('DELETE FROM posts_search WHERE id = %s', [rowid])
+
+    def rebuild(self, cursor):
+        cursor.execute('TRUNCATE posts_search')
+        cursor.execute(
+            'INSERT INTO posts_search (id, post_id, body, document) '
+            'SELECT id * 2, id, text, to_tsvector(%s::regconfig, text) '
+            'FROM posts_post',
+            [settings.SEARCH_CONFIG]
+        )
+        cursor.execute(
+            'INSERT INTO posts_search (id, post_id, body, document) '
+            'SELECT id * 2 + 1, post_id, text, '
+            'to_tsvector(%s::regconfig, text) FROM posts_comment',
+            [settings.SEARCH_CONFIG]
+        )
+
+    def search(self, cursor, query, after, limit):
+        # Ранг сортируется по убыванию, поэтому в курсор кладётся -rank.
+        sql = (
+            'SELECT id, post_id, ts_headline(%s::regconfig, body, q, %s), '
+            '-ts_rank(document, q)::float8 AS rank '
+            'FROM posts_search, plainto_tsquery(%s::regconfig, %s) q '
+            'WHERE document @@ q'
+        )
+        params = [
+            settings.SEARCH_CONFIG,
+            f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=30',
+            settings.SEARCH_CONFIG,
+            query,
+        ]
+        if after is not None:
+            sql += (
+                ' AND (-ts_rank(document, q)::float8 > %s'
+                ' OR (-ts_rank(document, q)::float8 = %s AND id > %s))'
+            )
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY rank, id LIMIT %s'
+        cursor.execute(sql, params + [limit])
+        return cursor.fetchall()
+
+    def post_ids(self, query):
+        return (
+            'SELECT id / 2 FROM posts_search '
+            'WHERE document @@ plainto_tsquery(%s::regconfig, %s) '
+            'AND id %% 2 = 0',
+            [settings.SEARCH_CONFIG, query]
+        )
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'postgresql': PostgreSQLBackend,
+}
+
+
+def _connection(write=False):
+    # Индекс лежит рядом с постами, поэтому база выбирается роутером
+    # для Post: внутри reads_replica поиск читает реплику.
+    if write:
+        return connections[router.db_for_write(Post)]
+    return connections[router.db_for_read(Post)]
+
+
+def backend(connection):
+    backend_class = BACKENDS.get(connection.vendor)
+    return backend_class() if backend_class else None
+
+
+def index(kind, pk, post_id, text):
+    connection = _connection(write=True)
+    search_backend = backend(connection)
+    if search_backend is not None:
+        with connection.cursor() as cursor:
+            search_backend.save(cursor, row_id(kind, pk), post_id, text)
+
+
+def unindex(kind, pk):
+    connection = _connection(write=True)
+    search_backend = backend(connection)
+    if search_backend is not None:
+        with connection.cursor() as cursor:
+            search_backend.delete(cursor, row_id(kind, pk))
+
+
+def reindex():
+    """Заново строит индекс по всем постам и комментариям."""
+    connection = _connection(write=True)
+    search_backend = backend(connection)
+    if search_backend is not None:
+        with connection.cursor() as cursor:
+            search_backend.rebuild(cursor)
+
+
+def search(query, cursor=None, limit=None):
+    """Находит посты и комментарии по запросу.
+
+    Возвращает список Hit не длиннее limit и курсор следующей
+    страницы (или None). Для баз без полнотекстового индекса
+    ищет подстроку в текстах постов.
+    """
+    limit = limit or settings.NUMBERS_POSTS
+    after = decode_cursor(cursor) if cursor else None
+    connection = _connection()
+    search_backend = backend(connection)
+    if search_backend is None:
+        posts = Post.objects.filter(text__icontains=query).order_by('-pk')
+        if after is not None:
+            posts = posts.filter(pk__lt=after[1] // 2)
+        rows = [
+            (row_id(POST, pk), pk, text, 0.0)
+            for pk, text in posts.values_list('pk', 'text')[:limit + 1]
+        ]
+    else:
+        with connection.cursor() as db_cursor:
+            rows = search_backend.search(db_cursor, query, after, limit + 1)
+    hits = [Hit(*row) for row in rows[:limit]]
+    posts = Post.objects.select_related('author').in_bulk(
+        {hit.post_id for hit in hits}
+    )
+    next_cursor = None
+    if len(rows) > limit and hits:
+        next_cursor = encode_cursor(hits[-1].rank, hits[-1].rowid)
+    for hit in hits:
+        hit.post = posts.get(hit.post_id)
+    return [hit for hit in hits if hit.post is not None], next_cursor
+
+
+def filter_posts(queryset, query):
+    """Посты из queryset, чей собственный текст подходит под запрос.
+
+    Подзапрос к индексу без LIMIT: совпадения в комментариях
+    не вытесняют посты, а список id не собирается в Python.
+    """
+    search_backend = backend(connections[queryset.db])
+    if search_backend is None:
+        return queryset.filter(text__icontains=query)
+    sql, params = search_backend.post_ids(query)
+    # pk__in=RawSQL(...) в Django 2.2 даёт IN ((SELECT ...)), и SQLite
+    # берёт из подзапроса только первую строку.
+    return queryset.extra(where=[f'posts_post.id IN ({sql})'], params=params)
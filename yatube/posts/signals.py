@@ -0,0 +1,157 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import feed, page_cache, search, stats, thumbnails
+from .models import (
+    Comment, FeedEntry, Follow, Group, Post, ProfileStats, User
+)
+
+
+def bump_post(post_id):
+    post = Post.objects.select_related(
+        'author', 'group'
+    ).filter(pk=post_id).first()
+    if post is not None:
+        page_cache.bump(*page_cache.post_scopes(post))
+
+
+def release_image(name):
+    # Ссылка снимается после коммита: при откате пост остаётся
+    # с картинкой.
+    storage = Post._meta.get_field('image').storage
+    transaction.on_commit(lambda: storage.delete(name))
+
+
+def author_changed(instance):
+    previous = getattr(instance, 'previous_author_id', None)
+    return previous is not None and previous != instance.author_id
+
+
+def move_counter(instance, name):
+    # Счётчик переезжает к новому автору; без этого удаление уводило
+    # бы счётчик нового автора ниже нуля.
+    stats.change(instance.previous_author_id, **{name: -1})
+    stats.change(instance.author_id, **{name: 1})
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        ProfileStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    # При переносе поста в другую группу сбрасываем кеш и старой группы,
+    # при замене картинки освобождаем старую, при смене автора
+    # переносим счётчик.
+    instance.previous_group_slug = instance.previous_image = None
+    instance.previous_author_id = None
+    # Файл ещё не записан в хранилище: это новая загрузка.
+    instance.image_uploaded = not instance.image._committed
+    if instance.pk:
+        (
+            instance.previous_group_slug,
+            instance.previous_image,
+            instance.previous_author_id,
+        ) = Post.objects.filter(pk=instance.pk).values_list(
+            'group__slug', 'image', 'author_id'
+        ).first() or (None, None, None)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.change(instance.author_id, posts_count=1)
+        feed.fan_out_post(instance)
+    elif author_changed(instance):
+        move_counter(instance, 'posts_count')
+        FeedEntry.objects.filter(post=instance).delete()
+        feed.fan_out_post(instance)
+        page_cache.bump(*(
+            f'profile:{username}' for username in User.objects.filter(
+                pk=instance.previous_author_id
+            ).values_list('username', flat=True)
+        ))
+    search.index(search.POST, instance.pk, instance.pk, instance.text)
+    thumbnails.schedule(instance)
+    page_cache.bump(*page_cache.post_scopes(instance))
+    previous_group_slug = getattr(instance, 'previous_group_slug', None)
+    if previous_group_slug:
+        page_cache.bump(f'group:{previous_group_slug}')
+    previous_image = getattr(instance, 'previous_image', None)
+    # Повторная загрузка того же файла тоже освобождает старую ссылку:
+    # хранилище уже добавило файлу новую.
+    if previous_image and (
+        previous_image != instance.image.name
+        or getattr(instance, 'image_uploaded', False)
+    ):
+        release_image(previous_image)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    stats.change(instance.author_id, posts_count=-1)
+    search.unindex(search.POST, instance.pk)
+    page_cache.bump(*page_cache.post_scopes(instance))
+    if instance.image:
+        release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        stats.change(instance.author_id, followers_count=1)
+        stats.change(instance.user_id, following_count=1)
+        feed.reclassify(instance.author_id, 1)
+        feed.backfill_follow(instance)
+    page_cache.bump(
+        f'profile:{instance.author.username}',
+        f'profile:{instance.user.username}'
+    )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    stats.change(instance.author_id, followers_count=-1)
+    stats.change(instance.user_id, following_count=-1)
+    feed.remove_follow(instance)
+    feed.reclassify(instance.author_id, -1)
+    page_cache.bump(
+        f'profile:{instance.author.username}',
+        f'profile:{instance.user.username}'
+    )
+
+
+@receiver(pre_save, sender=Comment)
+def comment_changing(sender, instance, **kwargs):
+    instance.previous_author_id = None
+    if instance.pk:
+        instance.previous_author_id = Comment.objects.filter(
+            pk=instance.pk
+        ).values_list('author_id', flat=True).first()
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        stats.change(instance.author_id, comments_count=1)
+    elif author_changed(instance):
+        move_counter(instance, 'comments_count')
+    search.index(
+        search.COMMENT, instance.pk, instance.post_id, instance.text
+    )
+    bump_post(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    stats.change(instance.author_id, comments_count=-1)
+    search.unindex(search.COMMENT, instance.pk)
+    bump_post(instance.post_id)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    page_cache.bump(f'group:{instance.slug}', 'groups')
@@ -0,0 +1,67 @@
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, ProfileStats, User
+
+COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+    'comments_count': (Comment, 'author'),
+}
+
+
+def _count(model, field):
+    """Подзапрос с числом строк model, где field = пользователь."""
+    counted = model.objects.filter(
+        **{field: OuterRef('user_id')}
+    ).order_by().values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def change(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя на заданные величины."""
+    with transaction.atomic():
+        updated = ProfileStats.objects.filter(user_id=user_id).update(
+            **{name: F(name) + delta for name, delta in deltas.items()}
+        )
+    if not updated:
+        # Строки нет и при каскадном удалении пользователя: пересчёт
+        # после коммита не воскресит счётчики удалённого профиля.
+        transaction.on_commit(
+            lambda: rebuild(User.objects.filter(pk=user_id))
+        )
+
+
+def rebuild(users=None):
+    """Пересчитывает счётчики пачкой: по одному UPDATE на счётчик."""
+    users = User.objects.all() if users is None else users
+    with transaction.atomic():
+        ProfileStats.objects.bulk_create(
+            [
+                ProfileStats(user_id=user_id)
+                for user_id in users.filter(
+                    stats__isnull=True
+                ).values_list('pk', flat=True)
+            ],
+            ignore_conflicts=True
+        )
+        ProfileStats.objects.filter(user__in=users).update(**{
+            name: _count(model, field)
+            for name, (model, field) in COUNTERS.items()
+        })
+
+
+def drifted():
+    """Строки счётчиков, расходящиеся с реальными данными."""
+    stats = ProfileStats.objects.annotate(**{
+        f'actual_{name}': _count(model, field)
+        for name, (model, field) in COUNTERS.items()
+    })
+    return stats.filter(reduce(or_, (
+        ~Q(**{name: F(f'actual_{name}')}) for name in COUNTERS
+    )))
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import posixpath
+from collections import Counter
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils.deconstruct import deconstructible
+
+
+def file_digest(content):
+    """SHA-256 содержимого файла, прочитанного по кускам."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_name(directory, digest, extension):
+    """Имя файла по хешу содержимого: posts/ab/abcd….jpg."""
+    return posixpath.join(
+        directory, digest[:2], digest + extension.lower()
+    )
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файлы под именем из хеша содержимого.
+
+    Одинаковые загрузки ложатся в один файл, число ссылок на него
+    ведёт MediaFile. delete() снимает одну ссылку, а после коммита
+    файл без ссылок удаляет collect().
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        directory, filename = posixpath.split(name)
+        name = content_name(
+            directory,
+            file_digest(content),
+            posixpath.splitext(filename)[1]
+        )
+        # Ссылка берётся раньше проверки файла и в той же транзакции:
+        # строка MediaFile заблокирована, и collect() не удалит файл
+        # между проверкой и коммитом.
+        with transaction.atomic():
+            self.retain(name)
+            if not self.exists(name):
+                name = self._save(name, content)
+        return name
+
+    def retain(self, name):
+        from .models import MediaFile
+        if MediaFile.objects.filter(name=name).update(refs=F('refs') + 1):
+            return
+        try:
+            with transaction.atomic():
+                MediaFile.objects.create(name=name, refs=1)
+        except IntegrityError:
+            # Строку только что создала параллельная загрузка.
+            MediaFile.objects.filter(name=name).update(refs=F('refs') + 1)
+
+    def delete(self, name):
+        from .models import MediaFile
+        with transaction.atomic():
+            released = MediaFile.objects.filter(
+                name=name, refs__gt=0
+            ).update(refs=F('refs') - 1)
+        # Файлы без учёта ссылок (до dedupe_media) не трогаем: на них
+        # могут ссылаться другие посты.
+        if released:
+            transaction.on_commit(lambda: self.collect(name))
+
+    def collect(self, name):
+        """Удаляет файл, если на него не осталось ссылок.
+
+        Строка удаляется условным DELETE, а файл — под её блокировкой:
+        параллельный save() дождётся коммита и запишет файл заново.
+        """
+        from .models import MediaFile
+        with transaction.atomic():
+            deleted, _ = MediaFile.objects.filter(
+                name=name, refs=0
+            ).delete()
+            if deleted:
+                self.delete_file(name)
+
+    def delete_file(self, name):
+        """Удаляет файл, не глядя на ссылки."""
+        super().delete(name)
+
+
+def recount_refs():
+    """Пересчитывает ссылки MediaFile по картинкам постов."""
+    from .models import MediaFile, Post
+    refs = Post.objects.exclude(image='').order_by().values(
+        'image'
+    ).annotate(refs=Count('pk')).values_list('image', 'refs')
+    with transaction.atomic():
+        MediaFile.objects.all().delete()
+        MediaFile.objects.bulk_create(
+            MediaFile(name=name, refs=count) for name, count in refs
+        )
+
+
+def dedupe(dry_run=False):
+    """Переносит картинки постов на имена по хешу содержимого.
+
+    Повторы удаляются, посты переключаются на общий файл. Возвращает
+    счётчики и словарь {новое имя: id поста} для перенесённых файлов.
+    """
+    from .models import Post
+    field = Post._meta.get_field('image')
+    storage = field.storage
+    counters = Counter()
+    moved = {}
+    names = Post.objects.exclude(image='').order_by().values_list(
+        'image', flat=True
+    ).distinct()
+    for name in list(names):
+        if not storage.exists(name):
+            counters['missing'] += 1
+            continue
+        with storage.open(name) as content:
+            target = content_name(
+                field.upload_to.rstrip('/'),
+                file_digest(content),
+                posixpath.splitext(name)[1]
+            )
+        if target == name:
+            continue
+        if storage.exists(target) or target in moved:
+            counters['removed'] += 1
+            counters['freed'] += storage.size(name)
+        else:
+            counters['moved'] += 1
+        moved.setdefault(target, None)
+        if dry_run:
+            continue
+        if storage.exists(target):
+            storage.delete_file(name)
+        else:
+            os.makedirs(
+                os.path.dirname(storage.path(target)), exist_ok=True
+            )
+            os.replace(storage.path(name), storage.path(target))
+        Post.objects.filter(image=name).update(image=target)
+        moved[target] = Post.objects.filter(
+            image=target
+        ).values_list('pk', flat=True).first()
+    if not dry_run:
+        recount_refs()
+    return counters, moved
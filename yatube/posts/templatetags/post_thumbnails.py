@@ -0,0 +1,11 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, preset='card'):
+    """Миниатюры по форматам; None, пока фоновая очередь их не создала."""
+    return thumbnails.ready(image, preset)
@@ -1,5 +1,8 @@
 import shutil
 import tempfile
+from io import BytesIO
+
+from PIL import Image
 
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
@@ -76,7 +79,7 @@ class PostFormTest(TestCase):
             'posts:profile',
             args={self.user.username}
         ))
-        self.assertEqual(new_post.image, f'posts/{uploaded}')
+        self.assertRegex(new_post.image.name, r'^posts/\w\w/\w{64}\.gif$')
         self.assertEqual(Post.objects.count(), posts_count + 1)
 
     def test_create_post_edite(self):
@@ -100,6 +103,102 @@ class PostFormTest(TestCase):
         self.assertEqual(edit_posts.author, self.user)
         self.assertEqual(Post.objects.count(), posts_count)
 
+    @override_settings(POST_IMAGE_MAX_SIZE=100)
+    def test_create_post_image_ingest(self):
+        """Картинка уменьшается и перекодируется без EXIF"""
+        photo = BytesIO()
+        exif = Image.Exif()
+        exif[0x0110] = 'Camera'
+        Image.new('RGB', (400, 200), 'red').save(photo, 'JPEG', exif=exif)
+        uploaded = SimpleUploadedFile(
+            name='photo.jpeg',
+            content=photo.getvalue(),
+            content_type='image/jpeg'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': uploaded}
+        )
+        post = Post.objects.get(text='Фото')
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertEqual((post.image_width, post.image_height), (100, 50))
+        self.assertEqual(post.image_bytes, post.image.size)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+            self.assertTrue(image.info.get('progressive'))
+
+    @override_settings(POST_IMAGE_MAX_SIZE=100)
+    def test_create_post_png_ingest(self):
+        """PNG остаётся PNG, но теряет EXIF и сохраняет прозрачность"""
+        picture = BytesIO()
+        exif = Image.Exif()
+        exif[0x0110] = 'Camera'
+        Image.new('RGBA', (400, 200), (255, 0, 0, 0)).save(
+            picture, 'PNG', exif=exif
+        )
+        uploaded = SimpleUploadedFile(
+            name='picture.png',
+            content=picture.getvalue(),
+            content_type='image/png'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Рисунок', 'image': uploaded}
+        )
+        post = Post.objects.get(text='Рисунок')
+        self.assertTrue(post.image.name.endswith('.png'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(image.mode, 'RGBA')
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_MAX_SIZE=100)
+    def test_create_post_animation_ingest(self):
+        """Анимация уменьшается покадрово и теряет комментарии"""
+        animation = BytesIO()
+        frames = [Image.new('RGB', (400, 200), color)
+                  for color in ('red', 'blue')]
+        frames[0].save(
+            animation, 'GIF', save_all=True, append_images=frames[1:],
+            duration=50, loop=0, comment=b'Camera'
+        )
+        uploaded = SimpleUploadedFile(
+            name='animation.gif',
+            content=animation.getvalue(),
+            content_type='image/gif'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Анимация', 'image': uploaded}
+        )
+        post = Post.objects.get(text='Анимация')
+        self.assertEqual((post.image_width, post.image_height), (100, 50))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(image.n_frames, 2)
+            self.assertNotIn('comment', image.info)
+
+    def test_create_post_broken_image(self):
+        """Обрезанный JPEG даёт ошибку формы, а не 500"""
+        photo = BytesIO()
+        Image.effect_noise((400, 200), 64).save(photo, 'JPEG')
+        # Заголовок цел, и проверка ImageField проходит; обрывается
+        # только сжатый поток.
+        uploaded = SimpleUploadedFile(
+            name='broken.jpg',
+            content=photo.getvalue()[:-2000],
+            content_type='image/jpeg'
+        )
+        posts_count = Post.objects.count()
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Битая картинка', 'image': uploaded}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].has_error('image'))
+        self.assertEqual(Post.objects.count(), posts_count)
+
     def test_text_help_text(self):
         title_help_text = PostFormTest.form.fields['text'].help_text
         self.assertEqual(title_help_text, 'Текст нового поста')
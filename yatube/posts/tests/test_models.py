@@ -1,10 +1,37 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
-from ..models import Group, Post
+from ..models import (
+    Comment, FeedEntry, Follow, Group, MediaFile, Post, ProfileStats
+)
+from .. import page_cache, stats, transfer
+from ..search import search
 
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
 
 class PostModelTest(TestCase):
     @classmethod
@@ -57,3 +84,221 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     post._meta.get_field(value).help_text, expected)
+
+
+class ProfileStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='someauthor')
+
+    def assertStats(self, user, **expected):
+        stats = ProfileStats.objects.get(user=user)
+        for name, value in expected.items():
+            with self.subTest(name=name):
+                self.assertEqual(getattr(stats, name), value)
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются вместе с постами, подписками
+        и комментариями.
+        """
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        Follow.objects.create(user=self.user, author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Тестовый комментарий'
+        )
+        self.assertStats(self.author, posts_count=1, followers_count=1)
+        self.assertStats(self.user, following_count=1, comments_count=1)
+        comment.delete()
+        Follow.objects.filter(user=self.user).delete()
+        post.delete()
+        self.assertStats(self.author, posts_count=0, followers_count=0)
+        self.assertStats(self.user, following_count=0, comments_count=0)
+
+    def test_counters_follow_author_change(self):
+        """Смена автора поста и комментария переносит счётчики."""
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Тестовый комментарий'
+        )
+        post.author = self.user
+        post.save()
+        comment.author = self.author
+        comment.save()
+        self.assertStats(self.author, posts_count=0, comments_count=1)
+        self.assertStats(self.user, posts_count=1, comments_count=0)
+        post.delete()
+        self.assertStats(self.author, posts_count=0, comments_count=0)
+        self.assertStats(self.user, posts_count=0, comments_count=0)
+
+    def test_rebuild_command(self):
+        """Команда находит и исправляет расхождения счётчиков."""
+        Post.objects.create(author=self.author, text='Тестовый пост')
+        ProfileStats.objects.filter(user=self.author).update(posts_count=5)
+        ProfileStats.objects.filter(user=self.user).delete()
+        out = StringIO()
+        call_command('rebuild_profile_stats', '--check', stdout=out)
+        self.assertIn('Расходящихся профилей: 1', out.getvalue())
+        self.assertStats(self.author, posts_count=5)
+        call_command('rebuild_profile_stats', stdout=StringIO())
+        self.assertStats(self.author, posts_count=1)
+        self.assertStats(self.user, posts_count=0)
+
+
+class TransferTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='someauthor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост про котиков', group=cls.group
+        )
+        cls.pub_date = timezone.now() - timedelta(days=30)
+        Post.objects.filter(pk=cls.post.pk).update(pub_date=cls.pub_date)
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Тестовый комментарий'
+        )
+
+    def test_export_import_roundtrip(self):
+        """Выгрузка загружается обратно вместе с производными данными."""
+        for data_format in ('ndjson', 'csv'):
+            with self.subTest(data_format=data_format):
+                with tempfile.TemporaryDirectory() as directory:
+                    path = os.path.join(directory, f'dump.{data_format}')
+                    call_command(
+                        'export_posts', '--format', data_format,
+                        '--output', path, stdout=StringIO()
+                    )
+                    User.objects.all().delete()
+                    Group.objects.all().delete()
+                    call_command(
+                        'import_posts', path, '--batch-size', '1',
+                        stdout=StringIO()
+                    )
+                post = Post.objects.get(pk=self.post.pk)
+                self.assertEqual(post.pub_date, self.pub_date)
+                self.assertEqual(post.author.username, 'someauthor')
+                self.assertEqual(post.group.slug, 'test-slug')
+                self.assertEqual(post.comments.get().author.username, 'auth')
+                self.assertTrue(Follow.objects.filter(
+                    user__username='auth', author=post.author
+                ).exists())
+                self.assertTrue(FeedEntry.objects.filter(post=post).exists())
+                self.assertEqual(post.author.stats.posts_count, 1)
+                self.assertEqual(len(search('котиков')[0]), 1)
+
+    def test_import_keeps_foreign_cache_keys(self):
+        """Импорт сбрасывает только версии этого сайта, не весь кеш."""
+        cache.set('other-site:page', 'страница')
+        site = page_cache.get_versions([page_cache.SITE_SCOPE])
+        transfer.finish_import(derived=False)
+        self.assertEqual(cache.get('other-site:page'), 'страница')
+        self.assertNotEqual(
+            page_cache.get_versions([page_cache.SITE_SCOPE]), site
+        )
+
+
+class SeedTest(TestCase):
+    def test_seed_command(self):
+        """seed создаёт строки и согласованные производные данные."""
+        call_command(
+            'seed', '--users', '30', '--groups', '3', '--posts', '200',
+            '--comments', '100', '--follows', '150', stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertEqual(Follow.objects.count(), 150)
+        self.assertFalse(stats.drifted().exists())
+        followers = sorted(
+            ProfileStats.objects.values_list('followers_count', flat=True)
+        )
+        # Степенной закон: у самого популярного автора подписчиков
+        # намного больше, чем у типичного.
+        self.assertGreater(followers[-1], followers[len(followers) // 2] * 3)
+        self.assertTrue(
+            self.client.login(username=User.objects.first().username,
+                              password='yatube')
+        )
+
+    def test_seed_derived_options(self):
+        """--feed-depth ограничивает ленты, --skip-derived их пропускает."""
+        call_command(
+            'seed', '--users', '20', '--groups', '0', '--posts', '200',
+            '--comments', '0', '--follows', '100', '--feed-depth', '1',
+            stdout=StringIO()
+        )
+        self.assertTrue(FeedEntry.objects.exists())
+        self.assertFalse(
+            FeedEntry.objects.values('user', 'post__author').annotate(
+                entries=Count('pk')
+            ).filter(entries__gt=1).exists()
+        )
+        call_command(
+            'seed', '--users', '5', '--groups', '0', '--posts', '10',
+            '--comments', '0', '--follows', '10', '--skip-derived',
+            stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 25)
+        self.assertEqual(ProfileStats.objects.count(), 20)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.storage = Post._meta.get_field('image').storage
+
+    def test_same_content_stored_once(self):
+        """Одинаковые файлы хранятся один раз, пока на них есть ссылки."""
+        first = self.storage.save('posts/a.gif', ContentFile(SMALL_GIF))
+        second = self.storage.save('posts/b.gif', ContentFile(SMALL_GIF))
+        self.assertEqual(first, second)
+        self.assertEqual(MediaFile.objects.get(name=first).refs, 2)
+        self.storage.delete(first)
+        self.assertTrue(self.storage.exists(first))
+        self.storage.delete(first)
+        # TestCase не выполняет on_commit: сборка вызывается вручную,
+        # как после коммита.
+        self.assertEqual(MediaFile.objects.get(name=first).refs, 0)
+        self.storage.collect(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertFalse(MediaFile.objects.filter(name=first).exists())
+
+    def test_collect_rechecks_refs(self):
+        """Файл, который снова загрузили до сборки, не удаляется."""
+        name = self.storage.save('posts/a.gif', ContentFile(SMALL_GIF))
+        self.storage.delete(name)
+        self.storage.save('posts/b.gif', ContentFile(SMALL_GIF))
+        self.storage.collect(name)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(MediaFile.objects.get(name=name).refs, 1)
+
+    def test_dedupe_command(self):
+        """dedupe_media сводит старые копии картинки в один файл."""
+        user = User.objects.create_user(username='auth')
+        for name in ('posts/a.gif', 'posts/b.gif'):
+            self.storage._save(name, ContentFile(SMALL_GIF))
+            Post.objects.create(author=user, text=name, image=name)
+        cache.set('other-site:page', 'страница')
+        call_command('dedupe_media', stdout=StringIO())
+        self.assertEqual(cache.get('other-site:page'), 'страница')
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(self.storage.exists(name))
+        self.assertFalse(self.storage.exists('posts/a.gif'))
+        self.assertFalse(self.storage.exists('posts/b.gif'))
+        self.assertEqual(MediaFile.objects.get(name=name).refs, 2)
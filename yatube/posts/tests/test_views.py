@@ -1,6 +1,7 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from unittest import mock, skipUnless
 
 from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
@@ -9,8 +10,16 @@ from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 
-from ..models import Group, Post, Follow
+from core.db_router import replica_reads
+
+from .. import feed, page_cache, thumbnails
+from .. import search as search_module
+from ..models import Comment, Group, Post, Follow, FeedEntry
+from ..paginator import CursorPaginator
+from ..search import reindex, search
+from .utils import ViewQueriesMixin
 
 User = get_user_model()
 
@@ -132,6 +141,7 @@ class PostViewsTest(TestCase):
         self.assertEqual(response.context['author'], self.user)
         post_0 = response.context['page_obj'][0]
         self.post_and_paginator_context(post_0)
+        self.assertContains(response, 'Всего постов: 1 ')
 
     def test_post_detail_correct_context(self):
         response = self.authorized_client.get(reverse(
@@ -175,16 +185,141 @@ class PostViewsTest(TestCase):
     def test_cache_index(self):
         response = self.authorized_client.get(reverse('posts:index'))
         response_content = response.content
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertIsNone(response.context)
+        self.assertEqual(response.content, response_content)
         self.post1 = Post.objects.create(
             text='test_new_post',
             author=self.user,
         )
         response = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response.content, response_content)
-        cache.clear()
-        response = self.authorized_client.get(reverse('posts:index'))
         self.assertIn(self.post1, response.context['page_obj'])
 
+    def test_cache_invalidation(self):
+        """Кеш страниц сбрасывается при изменении их данных"""
+        pages = {
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): (
+                'Комментариев: 1'
+            ),
+            reverse('posts:profile', args={self.user.username}): (
+                'Комментариев: 1'
+            ),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}): (
+                'Тестовый комментарий'
+            ),
+        }
+        for url in pages:
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                response = self.guest_client.get(url)
+                self.assertIsNone(response.context)
+        Comment.objects.create(
+            post=self.post,
+            author=self.user,
+            text='Тестовый комментарий'
+        )
+        for url, text in pages.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, text)
+
+    def test_post_card_fragments(self):
+        """Карточки постов берутся из кеша, пока пост не изменён"""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        self.assertTemplateUsed(response, 'posts/includes/post_list.html')
+        page_cache.bump('index')
+        response = self.guest_client.get(url)
+        self.assertTemplateUsed(response, 'posts/index.html')
+        self.assertTemplateNotUsed(
+            response, 'posts/includes/post_list.html'
+        )
+        self.assertContains(response, self.post.text)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Изменённый пост'
+        post.save()
+        response = self.guest_client.get(url)
+        self.assertTemplateUsed(response, 'posts/includes/post_list.html')
+        self.assertContains(response, 'Изменённый пост')
+
+    def test_conditional_get(self):
+        """Неизменившаяся страница отдаётся как 304 без запросов к базе"""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        response = self.guest_client.get(url)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('Last-Modified'))
+        Post.objects.create(
+            author=self.user, text='Новый пост', group=self.group
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_stale_page_without_validators(self):
+        """Устаревшая страница под блокировкой уходит без ETag"""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        etag = self.guest_client.get(url)['ETag']
+        Post.objects.create(
+            author=self.user, text='Новый пост', group=self.group
+        )
+        with mock.patch.object(page_cache, 'LOCK_KEY', 'page-lock-test'):
+            cache.add('page-lock-test', 1)
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertNotContains(response, 'Новый пост')
+            self.assertFalse(response.has_header('ETag'))
+            self.assertFalse(response.has_header('Last-Modified'))
+            self.assertIn('no-cache', response['Cache-Control'])
+            cache.delete('page-lock-test')
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Новый пост')
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_conditional_get_post_detail(self):
+        """304 на странице поста не ходит в базу за автором"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(author=self.post.author, text='Ещё пост')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(POST_THUMBNAIL_ASYNC=False)
+    def test_thumbnails_pregenerated(self):
+        """Миниатюры создаются заранее, до них показывается заглушка"""
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertIsNone(thumbnails.ready(post.image, 'card'))
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotContains(response, '<img class="card-img')
+        thumbnails.generate(post.pk)
+        ready = thumbnails.ready(post.image, 'card')
+        self.assertIsNotNone(ready)
+        self.assertGreater(
+            Post.objects.get(pk=post.pk).updated_at, post.updated_at
+        )
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, ready['JPEG'].url)
+
+    def test_cache_variants(self):
+        """Гость и авторизованный пользователь получают разные страницы"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.authorized_client.get(url)
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, 'Добавить комментарий')
+
 
 class PaginatorTest(TestCase):
     @classmethod
@@ -238,6 +373,83 @@ class PaginatorTest(TestCase):
             with self.subTest(response=response):
                 self.assertEqual(len(response.context['page_obj']), num)
 
+    def test_cursor_paginator(self):
+        """Переход по курсорам вперёд и назад"""
+        for i in range(settings.NUMBERS_POSTS + PAGI_ON_NEXT_PAGE):
+            Post.objects.create(
+                author=self.user,
+                text='Тестовый пост' + str(i),
+                group=self.group
+            )
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', args={self.user.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                first_page = self.authorized_client.get(url).context[
+                    'page_obj'
+                ]
+                self.assertEqual(len(first_page), settings.NUMBERS_POSTS)
+                self.assertIsNone(first_page.previous_cursor)
+                self.assertIsNotNone(first_page.next_cursor)
+                next_page = self.authorized_client.get(
+                    url + '?cursor=' + first_page.next_cursor
+                ).context['page_obj']
+                self.assertEqual(len(next_page), PAGI_ON_NEXT_PAGE)
+                self.assertIsNone(next_page.next_cursor)
+                self.assertEqual(
+                    next_page[0],
+                    Post.objects.order_by('pub_date', 'pk').first()
+                )
+                previous_page = self.authorized_client.get(
+                    url + '?cursor=' + next_page.previous_cursor
+                ).context['page_obj']
+                self.assertEqual(
+                    list(previous_page), list(first_page)
+                )
+                self.assertIsNone(previous_page.previous_cursor)
+
+    def test_cursor_paginator_broken_cursor(self):
+        """Битый курсор отдаёт первую страницу"""
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        response = self.authorized_client.get(
+            reverse('posts:index') + '?cursor=broken'
+        )
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_paginator_count_limit(self):
+        """Приблизительный подсчёт не идёт дальше лимита"""
+        for i in range(settings.NUMBERS_POSTS + PAGI_ON_NEXT_PAGE):
+            Post.objects.create(author=self.user, text='Тестовый пост')
+        paginator = CursorPaginator(
+            Post.objects.all(),
+            settings.NUMBERS_POSTS,
+            count_limit=settings.NUMBERS_POSTS
+        )
+        self.assertEqual(paginator.count, settings.NUMBERS_POSTS)
+        self.assertTrue(paginator.count_is_approximate)
+
+    def test_legacy_page_out_of_range(self):
+        """?page=N за концом ленты — 404, за лимитом подсчёта — страница"""
+        for i in range(settings.NUMBERS_POSTS + PAGI_ON_NEXT_PAGE):
+            Post.objects.create(author=self.user, text='Тестовый пост')
+        url = reverse('posts:index')
+        response = self.authorized_client.get(url, {'page': 99})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.authorized_client.get(url, {'page': 'last'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        with self.settings(PAGINATOR_COUNT_LIMIT=settings.NUMBERS_POSTS):
+            response = self.authorized_client.get(url, {'page': 2})
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertEqual(
+                len(response.context['page_obj']), PAGI_ON_NEXT_PAGE
+            )
+            response = self.authorized_client.get(url, {'page': 3})
+            self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
 
 class FollowTest(TestCase):
     @classmethod
@@ -302,3 +514,270 @@ class FollowTest(TestCase):
         self.assertIn(self.post, response.context['page_obj'])
         response = self.authorized_client1.get(reverse('posts:follow_index'))
         self.assertNotIn(self.post, response.context['page_obj'])
+
+    def test_follow_feed_materialized(self):
+        """Пост раскладывается по лентам подписчиков и убирается
+        при отписке.
+        """
+        old_post = Post.objects.create(author=self.author, text='Старый')
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, post=old_post
+        ).exists())
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, post=new_post
+        ).exists())
+        self.assertFalse(FeedEntry.objects.filter(user=self.user1).exists())
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    @override_settings(FEED_DEPTH=1)
+    def test_feed_rebuild_depth(self):
+        """Пересборка кладёт в ленту только последние посты автора"""
+        old_post = Post.objects.create(author=self.author, text='Старый')
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        Follow.objects.create(user=self.user, author=self.author)
+        feed.rebuild()
+        self.assertEqual(
+            list(FeedEntry.objects.values_list('post', flat=True)),
+            [new_post.pk]
+        )
+        self.assertNotIn(old_post.pk, FeedEntry.objects.values_list(
+            'post', flat=True
+        ))
+
+    @override_settings(FEED_FANOUT_THRESHOLD=1)
+    def test_follow_feed_celebrity(self):
+        """Посты знаменитостей не раскладываются, но видны в ленте"""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+        response = self.authorized_client1.get(reverse('posts:follow_index'))
+        self.assertNotIn(post, response.context['page_obj'])
+
+    @override_settings(FEED_FANOUT_THRESHOLD=2)
+    def test_follow_feed_threshold_crossing(self):
+        """Автор, перешедший порог в любую сторону, не пропадает из ленты"""
+        old_post = Post.objects.create(author=self.author, text='Старый')
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.user1, author=self.author)
+        self.assertFalse(
+            FeedEntry.objects.filter(post__author=self.author).exists()
+        )
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertIn(new_post, feed.follow_feed(self.user))
+        Follow.objects.filter(user=self.user1, author=self.author).delete()
+        self.assertEqual(
+            set(FeedEntry.objects.filter(
+                post__author=self.author
+            ).values_list('user_id', 'post_id')),
+            {(self.user.pk, old_post.pk), (self.user.pk, new_post.pk)}
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(new_post, response.context['page_obj'])
+        self.assertIn(old_post, response.context['page_obj'])
+
+
+class FeedQueriesTest(ViewQueriesMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='someauthor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(settings.NUMBERS_POSTS):
+            post = Post.objects.create(
+                author=cls.author,
+                text='Тестовый пост' + str(i),
+                group=cls.group
+            )
+            Comment.objects.create(
+                post=post,
+                author=cls.user,
+                text='Тестовый комментарий'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_queries(self):
+        """Число запросов ленты не зависит от числа постов"""
+        views_queries = {
+            reverse('posts:index'): 3,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 4,
+            reverse('posts:profile', args={self.author.username}): 5,
+            reverse('posts:follow_index'): 4,
+        }
+        for url, num in views_queries.items():
+            with self.subTest(url=url):
+                response = self.assertViewNumQueries(
+                    num, self.authorized_client, url
+                )
+                self.assertContains(response, 'Комментариев: 1')
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN')
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент не скатываются в полный проход по таблице"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', args={self.author.username}),
+            reverse('posts:follow_index'),
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': Post.objects.first().pk}
+            ),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertViewUsesIndexes(self.authorized_client, url)
+
+
+class CommentsTest(ViewQueriesMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(settings.COMMENTS_PER_PAGE + 5)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_post_detail_comments_page(self):
+        """На странице поста только первая страница комментариев"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.assertViewNumQueries(3, self.guest_client, url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertIsNotNone(comments.next_cursor)
+        response = self.guest_client.get(
+            url, {'comments': comments.next_cursor}
+        )
+        self.assertEqual(len(response.context['comments']), 5)
+
+    def test_post_comments_fragment(self):
+        """Следующие комментарии отдаются фрагментом и в JSON"""
+        first = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ).context['comments']
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        response = self.guest_client.get(
+            url, {'cursor': first.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertNotContains(response, 'Комментарий 19<')
+        self.assertContains(response, 'Комментарий 24')
+        self.assertNotContains(response, 'comments-more')
+        response = self.guest_client.get(
+            url, {'cursor': first.next_cursor, 'format': 'json'}
+        )
+        data = response.json()
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            [f'Комментарий {i}' for i in range(20, 25)]
+        )
+        self.assertIsNone(data['next_cursor'])
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост про <b>котиков</b>',
+        )
+        Post.objects.create(author=cls.user, text='Пост про собак')
+        Comment.objects.create(
+            post=cls.post,
+            author=cls.user,
+            text='Комментарий про котиков',
+        )
+
+    def test_search_posts_and_comments(self):
+        """Поиск находит посты и комментарии и подсвечивает совпадения"""
+        response = self.client.get(reverse('posts:search'), {'q': 'котиков'})
+        hits = response.context['hits']
+        self.assertEqual(len(hits), 2)
+        self.assertEqual({hit.post for hit in hits}, {self.post})
+        self.assertContains(
+            response, 'Пост про &lt;b&gt;<mark>котиков</mark>&lt;/b&gt;'
+        )
+        self.assertContains(response, 'Комментарий про <mark>котиков</mark>')
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_search_reads_replica(self):
+        """Поиск внутри replica_reads читает индекс с реплики"""
+        databases = mock.MagicMock()
+        with mock.patch.object(search_module, 'connections', databases):
+            with replica_reads():
+                search_module._connection()
+                databases.__getitem__.assert_called_with('replica1')
+                search_module._connection(write=True)
+                databases.__getitem__.assert_called_with('default')
+
+    def test_search_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении поста"""
+        post = Post.objects.get(text='Пост про собак')
+        post.text = 'Пост про хомяков'
+        post.save()
+        self.assertEqual(search('собак'), ([], None))
+        self.assertEqual(search('хомяков')[0][0].post, post)
+        post.delete()
+        self.assertEqual(search('хомяков'), ([], None))
+
+    def test_search_cursor(self):
+        """Результаты поиска листаются курсором"""
+        hits, cursor = search('про', limit=2)
+        self.assertEqual(len(hits), 2)
+        next_hits, next_cursor = search('про', cursor=cursor, limit=2)
+        self.assertEqual(len(next_hits), 1)
+        self.assertIsNone(next_cursor)
+        self.assertFalse(
+            {hit.rowid for hit in hits} & {hit.rowid for hit in next_hits}
+        )
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котиков'}
+        )
+        self.assertEqual(list(response.context['cl'].result_list), [self.post])
+        # Короткие комментарии ранжируются выше постов, но не отнимают
+        # у них места в выдаче админки.
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text='котиков')
+            for _ in range(1000)
+        )
+        reindex()
+        post = Post.objects.create(author=self.user, text='Ещё котиков')
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котиков'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list), {self.post, post}
+        )
@@ -0,0 +1,39 @@
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Строка плана SQLite для полного прохода по таблице без индекса.
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?posts_\w+$')
+
+
+class ViewQueriesMixin:
+    """Проверка числа и планов SQL-запросов, которые делает view."""
+
+    def assertViewNumQueries(self, num, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        executed = '\n'.join(
+            query['sql'] for query in queries.captured_queries
+        )
+        self.assertEqual(
+            len(queries), num,
+            f'{url}: {len(queries)} запросов вместо {num}\n{executed}'
+        )
+        return response
+
+    def assertViewUsesIndexes(self, client, url):
+        """Ни один SELECT по таблицам posts не читает таблицу целиком."""
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or 'posts_' not in sql:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+            scans = [line for line in plan if FULL_SCAN.match(line)]
+            self.assertFalse(
+                scans, f'{url}: полный проход {scans}\n{sql}\n{plan}'
+            )
@@ -0,0 +1,123 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import metrics
+
+from . import page_cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def formats():
+    """Форматы из POST_THUMBNAIL_FORMATS, которые умеют и Pillow, и sorl.
+
+    Pillow сохраняет WebP только со сборкой libwebp, а AVIF — с версии
+    11.2 или с плагином pillow-avif-plugin; sorl-thumbnail 12.7 AVIF
+    не знает вовсе. Такие форматы молча пропускаются, иначе миниатюры
+    никогда не считались бы готовыми.
+    """
+    Image.init()
+    return [
+        image_format for image_format in settings.POST_THUMBNAIL_FORMATS
+        if image_format in EXTENSIONS and image_format in Image.SAVE
+    ]
+
+
+class LookupBackend(ThumbnailBackend):
+    """Ищет готовую миниатюру в KV-хранилище sorl, не создавая её."""
+
+    def get_cached(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def ready(image, preset):
+    """Готовые миниатюры картинки по форматам или None, если их ещё нет."""
+    if not image:
+        return None
+    geometry, options = settings.POST_THUMBNAIL_PRESETS[preset]
+    backend = LookupBackend()
+    thumbnails = {}
+    for image_format in formats():
+        thumbnail = backend.get_cached(
+            image, geometry, format=image_format, **options
+        )
+        if thumbnail is None:
+            return None
+        thumbnails[image_format] = thumbnail
+    return thumbnails
+
+
+def generate(post_id):
+    """Создаёт все размеры и форматы миниатюр картинки поста.
+
+    Когда появились новые миниатюры, у поста сдвигается updated_at:
+    закешированные карточки и страницы с заглушкой перерисуются.
+    """
+    try:
+        post = Post.objects.select_related(
+            'author', 'group'
+        ).filter(pk=post_id).first()
+        if post is None or not post.image:
+            return
+        created = False
+        presets = settings.POST_THUMBNAIL_PRESETS
+        for preset, (geometry, options) in presets.items():
+            if ready(post.image, preset) is not None:
+                continue
+            with metrics.timer('thumbnail', metrics.THUMBNAIL_TIME):
+                for image_format in formats():
+                    get_thumbnail(
+                        post.image, geometry, format=image_format, **options
+                    )
+            created = True
+        if created:
+            Post.objects.filter(pk=post_id).update(updated_at=timezone.now())
+            page_cache.bump(*page_cache.post_scopes(post))
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', post_id)
+    finally:
+        if settings.POST_THUMBNAIL_ASYNC:
+            connection.close()
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.POST_THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def schedule(post):
+    """Ставит создание миниатюр в фоновую очередь после коммита."""
+    if not post.image:
+        return
+    if settings.POST_THUMBNAIL_ASYNC:
+        transaction.on_commit(lambda: executor().submit(generate, post.pk))
+    else:
+        transaction.on_commit(lambda: generate(post.pk))
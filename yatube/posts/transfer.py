@@ -0,0 +1,221 @@
+import csv
+import json
+from contextlib import contextmanager
+from itertools import groupby
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import feed, page_cache, search, stats, storage
+from .models import Comment, Follow, Group, Post, User
+
+# Порядок важен: при загрузке группы и посты должны появиться раньше
+# ссылающихся на них строк. Пользователи передаются по username.
+MODELS = {
+    'group': (Group, (
+        ('id', 'pk'),
+        ('title', 'title'),
+        ('slug', 'slug'),
+        ('description', 'description'),
+    )),
+    'post': (Post, (
+        ('id', 'pk'),
+        ('author', 'author__username'),
+        ('group', 'group_id'),
+        ('text', 'text'),
+        ('pub_date', 'pub_date'),
+        ('image', 'image'),
+    )),
+    'comment': (Comment, (
+        ('id', 'pk'),
+        ('post', 'post_id'),
+        ('author', 'author__username'),
+        ('text', 'text'),
+        ('created', 'created'),
+    )),
+    'follow': (Follow, (
+        ('user', 'user__username'),
+        ('author', 'author__username'),
+    )),
+}
+
+USER_FIELDS = ('author', 'user')
+DATE_FIELDS = ('pub_date', 'created')
+ID_FIELDS = ('id', 'group', 'post')
+
+CSV_COLUMNS = ['model'] + list(dict.fromkeys(
+    column for _, fields in MODELS.values() for column, _ in fields
+))
+
+
+def export_rows(batch_size):
+    """Генератор строк всех моделей; в памяти не больше batch_size."""
+    for name, (model, fields) in MODELS.items():
+        columns = [column for column, _ in fields]
+        values = model.objects.order_by('pk').values_list(
+            *(lookup for _, lookup in fields)
+        )
+        for row in values.iterator(chunk_size=batch_size):
+            data = dict(zip(columns, row))
+            for column in DATE_FIELDS:
+                if data.get(column) is not None:
+                    data[column] = data[column].isoformat()
+            yield {'model': name, **data}
+
+
+def write_ndjson(rows, stream):
+    count = 0
+    for row in rows:
+        stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def write_csv(rows, stream):
+    writer = csv.DictWriter(stream, CSV_COLUMNS, lineterminator='\n')
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(stream):
+    # В CSV нет null: пустые ячейки означают отсутствие значения.
+    for row in csv.DictReader(stream):
+        yield {
+            column: value for column, value in row.items()
+            if value != '' or column in ('text', 'description', 'image')
+        }
+
+
+WRITERS = {'ndjson': write_ndjson, 'csv': write_csv}
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+
+@contextmanager
+def keep_dates():
+    """Отключает auto_now_add, чтобы сохранить даты из выгрузки."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _user_ids(rows):
+    """id пользователей из пачки; недостающие создаются без пароля."""
+    usernames = {
+        row[column] for row in rows for column in USER_FIELDS
+        if row.get(column)
+    }
+    missing = usernames - set(
+        User.objects.filter(
+            username__in=usernames
+        ).values_list('username', flat=True)
+    )
+    User.objects.bulk_create(
+        [
+            User(username=username, password=make_password(None))
+            for username in missing
+        ],
+        ignore_conflicts=True
+    )
+    return dict(
+        User.objects.filter(
+            username__in=usernames
+        ).values_list('username', 'pk')
+    )
+
+
+def _build(name, row, user_ids):
+    model, fields = MODELS[name]
+    values = {}
+    for column, _ in fields:
+        value = row.get(column)
+        if column in USER_FIELDS:
+            values[f'{column}_id'] = user_ids[value]
+        elif column in ID_FIELDS:
+            field = 'pk' if column == 'id' else f'{column}_id'
+            values[field] = int(value) if value is not None else None
+        elif column in DATE_FIELDS:
+            values[column] = parse_datetime(value)
+        else:
+            values[column] = value if value is not None else ''
+    if name == 'follow' and values['user_id'] == values['author_id']:
+        return None
+    return model(**values)
+
+
+def _batches(rows, batch_size):
+    for name, group in groupby(rows, key=lambda row: row['model']):
+        if name not in MODELS:
+            raise ValueError(f'Неизвестная модель: {name}')
+        batch = []
+        for row in group:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield name, batch
+                batch = []
+        if batch:
+            yield name, batch
+
+
+def import_rows(rows, batch_size):
+    """Загружает строки пачками bulk_create, по транзакции на пачку.
+
+    Существующие строки (по id или уникальным полям) пропускаются.
+    Возвращает число обработанных строк по моделям.
+    """
+    counts = dict.fromkeys(MODELS, 0)
+    with keep_dates():
+        for name, batch in _batches(rows, batch_size):
+            model = MODELS[name][0]
+            with transaction.atomic():
+                user_ids = _user_ids(batch)
+                objects = [_build(name, row, user_ids) for row in batch]
+                model.objects.bulk_create(
+                    [obj for obj in objects if obj is not None],
+                    ignore_conflicts=True
+                )
+            counts[name] += len(batch)
+    finish_import()
+    return counts
+
+
+def finish_import(derived=True, feed_depth=None):
+    """Догоняет производные данные, которые bulk_create не обновляет.
+
+    Без derived сбрасываются только последовательности ключей:
+    счётчики, ленты, поиск и ссылки на файлы строятся позже
+    повторным вызовом.
+    """
+    sequences = connection.ops.sequence_reset_sql(
+        no_style(), [User, Group, Post, Comment, Follow]
+    )
+    with connection.cursor() as cursor:
+        for statement in sequences:
+            cursor.execute(statement)
+    if derived:
+        stats.rebuild()
+        feed.rebuild(depth=feed_depth)
+        search.reindex()
+        storage.recount_refs()
+    # Версии страниц и карточек не знают о загруженных строках; общий
+    # бэкенд кеша не очищается, чтобы не задеть другие сайты.
+    page_cache.bump_site()
@@ -1,36 +1,88 @@
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.paginator import EmptyPage
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
 
+from core.db_router import reads_replica
+
+from .feed import follow_feed
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
+from .fragments import attach_cards
+from .models import Comment, Post, Group, User, Follow
+from .page_cache import cached_page, conditional_page, post_author
+from .paginator import CursorPaginator
+from .search import search
 
 
 def page_get(post, request):
-    paginator = Paginator(post, settings.NUMBERS_POSTS)
+    paginator = CursorPaginator(
+        post,
+        settings.NUMBERS_POSTS,
+        count_limit=settings.PAGINATOR_COUNT_LIMIT
+    )
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    if page_number is not None:
+        # старые ссылки вида ?page=N продолжают работать через OFFSET
+        try:
+            return paginator.number_page(page_number)
+        except EmptyPage:
+            raise Http404('Страница за концом ленты.')
+    return paginator.cursor_page(request.GET.get('cursor'))
+
+
+def comments_get(post_id, cursor):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('text', 'created', 'post_id', 'author__username')
+    paginator = CursorPaginator(
+        comments,
+        settings.COMMENTS_PER_PAGE,
+        date_field='created',
+        ascending=True
+    )
+    return paginator.cursor_page(cursor)
+
+
+def index_scopes():
+    return ['index']
+
+
+def group_scopes(slug):
+    return [f'group:{slug}']
 
 
-@cache_page(20)
+def profile_scopes(username):
+    return [f'profile:{username}']
+
+
+def post_detail_scopes(post_id):
+    return [f'post:{post_id}', f'profile:{post_author(post_id)}']
+
+
+@reads_replica
+@conditional_page(index_scopes)
+@cached_page(index_scopes)
 def index(request):
     template = 'posts/index.html'
-    post = Post.objects.all()
+    post = Post.objects.for_feed()
     page_obj = page_get(post, request)
+    attach_cards(page_obj)
     context = {
         'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
+@reads_replica
+@conditional_page(group_scopes)
+@cached_page(group_scopes)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.group_posts.all()
+    posts = group.group_posts.for_feed()
     page_obj = page_get(posts, request)
+    attach_cards(page_obj, group)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -38,11 +90,18 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@reads_replica
+@conditional_page(profile_scopes)
+@cached_page(profile_scopes)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    posts = author.author_posts.all()
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    posts = author.author_posts.for_feed()
     page_obj = page_get(posts, request)
+    attach_cards(page_obj)
     following = (request.user.is_authenticated
                  and Follow.objects.filter(
                      user=request.user,
@@ -55,13 +114,61 @@ def profile(request, username):
     return render(request, template, context)
 
 
+@reads_replica
+@conditional_page(post_detail_scopes)
+@cached_page(post_detail_scopes)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        pk=post_id
+    )
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
-        'form': form
+        'form': form,
+        'comments': comments_get(post_id, request.GET.get('comments')),
+    }
+    return render(request, template, context)
+
+
+@reads_replica
+@cached_page(lambda post_id: [f'post:{post_id}'])
+def post_comments(request, post_id):
+    """Следующая страница комментариев: HTML-фрагмент или JSON."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = comments_get(post_id, request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+        }, json_dumps_params={'ensure_ascii': False})
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+@reads_replica
+def post_search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    hits, next_cursor = [], None
+    if query:
+        hits, next_cursor = search(query, request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'hits': hits,
+        'next_cursor': next_cursor,
     }
     return render(request, template, context)
 
@@ -117,10 +224,12 @@ def add_comment(request, post_id):
 
 
 @login_required
+@reads_replica
 def follow_index(request):
     template = 'posts/follow.html'
-    posts_list = Post.objects.filter(author__following__user=request.user)
+    posts_list = follow_feed(request.user).for_feed()
     page_obj = page_get(posts_list, request)
+    attach_cards(page_obj)
     context = {
         'page_obj': page_obj,
     }
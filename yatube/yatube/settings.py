@@ -45,10 +45,13 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,15 +59,19 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaStickinessMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
+# Адреса, которым открыт /metrics.
+INTERNAL_IPS = ['127.0.0.1', '::1']
+
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -79,6 +86,17 @@ TEMPLATES = [
     },
 ]
 
+# Загрузчики, которые подразумевает APP_DIRS; профили и команды
+# bench_* оборачивают их в cached.Loader и CollapseWhitespaceLoader.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+# Разбирать ли все шаблоны при старте воркера (yatube.wsgi); имеет
+# смысл только с cached.Loader.
+TEMPLATE_WARMUP = False
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -88,10 +106,40 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.getenv(
+            'DATABASE_NAME', os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
     }
 }
 
+# PRAGMA для каждого нового соединения с SQLite (core.db).
+SQLITE_PRAGMAS = {}
+
+# Реплики только для чтения: DATABASE_REPLICAS — пути к файлам SQLite
+# через запятую (локально достаточно копий db.sqlite3). С реплик читают
+# view, помеченные core.db_router.reads_replica.
+DATABASES.update({
+    f'replica{number}': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        # В тестах реплика указывает на тестовую основную базу.
+        'TEST': {'MIRROR': 'default'},
+    }
+    for number, name in enumerate(
+        os.getenv('DATABASE_REPLICAS', '').split(','), 1
+    )
+    if name
+})
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Сколько секунд после записи браузер читает основную базу.
+REPLICA_STICKY_SECONDS: int = 10
+
+REPLICA_STICKY_COOKIE = 'primary_db'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -133,8 +181,36 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
+STATIC_ROOT = os.getenv(
+    'STATIC_ROOT', os.path.join(BASE_DIR, 'collected_static')
+)
+
 NUMBERS_POSTS: int = 10
 
+COMMENTS_PER_PAGE: int = 20
+
+API_PAGE_SIZE: int = 20
+
+# Срок жизни токена API (api.auth.issue_token), секунд.
+API_TOKEN_MAX_AGE: int = 30 * 24 * 60 * 60
+
+# Если задано, пагинатор считает записи не дальше этого числа
+# (приблизительный COUNT для старых ссылок ?page=N).
+PAGINATOR_COUNT_LIMIT = None
+
+# Посты авторов с таким числом подписчиков не раскладываются
+# по лентам при публикации, а читаются в ленте подписок напрямую.
+FEED_FANOUT_THRESHOLD: int = 1000
+
+FEED_BATCH_SIZE: int = 1000
+
+# Сколько последних постов каждого автора лежит в лентах подписчиков
+# после подписки и пересборки (posts.feed.rebuild).
+FEED_DEPTH: int = 200
+
+# Конфигурация полнотекстового поиска PostgreSQL (to_tsvector).
+SEARCH_CONFIG = 'russian'
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -144,14 +220,91 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
-CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+CSRF_FAILURE_VIEW = 'core.view.csrf_failure'
 
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Файлы с хешем в имени (core.files) браузер хранит год и не
+# перепроверяет; остальные перепроверяет по ETag при каждом показе.
+STATIC_MAX_AGE: int = 60 * 60 * 24 * 365
+
+MEDIA_MAX_AGE: int = 60 * 60 * 24 * 365
+
+# X-Sendfile (Apache, lighttpd) получает путь к файлу, X-Accel-Redirect
+# (nginx) — SENDFILE_PREFIX + адрес запроса, то есть internal-location.
+SENDFILE_HEADER = os.getenv('SENDFILE_HEADER')
+
+SENDFILE_PREFIX = os.getenv('SENDFILE_PREFIX', '/internal')
+
+# Текст короче этого не сжимается: выигрыш меньше накладных расходов.
+COMPRESS_MIN_SIZE: int = 1024
+
+# Уровни сжатия ответов на лету (core.middleware.CompressionMiddleware):
+# дальше этих значений размер почти не падает, а время растёт.
+COMPRESS_LEVELS = {'br': 5, 'gzip': 6}
+
+# Кеш общий для всех воркеров, если выбран не locmem:
+# CACHE_BACKEND=file|memcached|redis, CACHE_LOCATION — каталог или адреса
+# серверов, CACHE_KEY_PREFIX отделяет ключи разных развёртываний.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+CACHE_POOL_SIZE = int(os.getenv('CACHE_POOL_SIZE', 10))
+
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', {}),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', {}),
+    'memcached': (
+        'core.cache_backends.PooledMemcachedCache',
+        {'max_pool_size': CACHE_POOL_SIZE},
+    ),
+    'redis': (
+        'django_redis.cache.RedisCache',
+        {'CONNECTION_POOL_KWARGS': {'max_connections': CACHE_POOL_SIZE}},
+    ),
+}
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache') if CACHE_BACKEND == 'file' else ''
+        ),
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'yatube'),
+        'OPTIONS': CACHE_BACKENDS[CACHE_BACKEND][1],
     }
 }
+
+# Сколько секунд страница считается свежей; устаревание по данным
+# отслеживается версиями в posts.page_cache.
+PAGE_CACHE_TIMEOUT: int = 300
+
+PAGE_CACHE_LOCK_TIMEOUT: int = 10
+
+# Сколько секунд запрос ждёт чужого пересчёта страницы, которой нет в кеше.
+PAGE_CACHE_LOCK_WAIT: float = 1
+
+# Срок жизни отрендеренных карточек постов (posts.fragments).
+POST_CARD_TIMEOUT: int = 60 * 60 * 24
+
+# Миниатюры картинок постов создаются заранее в фоновых потоках
+# (posts.thumbnails); до готовности шаблоны показывают заглушку.
+POST_THUMBNAIL_PRESETS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+# Форматы, которые не умеют установленные Pillow и sorl, пропускаются
+# (posts.thumbnails.formats): AVIF, например, не пишет Pillow 8.3.
+POST_THUMBNAIL_FORMATS = ('JPEG', 'WEBP', 'AVIF')
+
+POST_THUMBNAIL_WORKERS: int = 2
+
+POST_THUMBNAIL_ASYNC = True
+
+# Загруженные картинки уменьшаются до этого размера по большей стороне
+# и перекодируются без метаданных (posts.images).
+POST_IMAGE_MAX_SIZE: int = 2048
+
+POST_IMAGE_QUALITY: int = 85
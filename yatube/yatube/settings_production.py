@@ -0,0 +1,61 @@
+"""Боевой профиль: DJANGO_SETTINGS_MODULE=yatube.settings_production."""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, TEMPLATE_LOADERS, TEMPLATES
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost').split(',')
+
+# collectstatic даёт файлам имена с хешем содержимого и готовит
+# сжатые копии для core.files.
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+
+# Пробелы в шаблонах сводятся один раз при разборе
+# (TEMPLATE_COLLAPSE_WHITESPACE=0 выключает). С явными loaders Django
+# сам не кеширует шаблоны, поэтому cached.Loader указан явно.
+template_loaders = TEMPLATE_LOADERS
+if os.getenv('TEMPLATE_COLLAPSE_WHITESPACE', '1') == '1':
+    template_loaders = [
+        ('core.template_loaders.CollapseWhitespaceLoader', template_loaders),
+    ]
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', template_loaders),
+]
+TEMPLATE_WARMUP = True
+
+# Соединение живёт между запросами; перед запросом оно проверяется
+# (core.db.check_connections).
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = 600
+    database['CONN_HEALTH_CHECKS'] = True
+
+# WAL разрешает читать во время записи; synchronous=NORMAL в режиме WAL
+# не теряет целостность, только последние транзакции при сбое питания.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+}
+
+# Хешер новых паролей: argon2 (pip install argon2-cffi), bcrypt
+# (pip install bcrypt) или pbkdf2. Остальные остаются в списке, чтобы
+# старые хеши проверялись и пересчитывались при входе.
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2')
+HASHERS = {
+    'argon2': 'core.hashers.TunedArgon2PasswordHasher',
+    'bcrypt': 'core.hashers.TunedBCryptSHA256PasswordHasher',
+    'pbkdf2': 'core.hashers.TunedPBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in HASHERS.items() if name != PASSWORD_HASHER
+]
+ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST', 512))  # КиБ
+ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM', 2))
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+PBKDF2_ITERATIONS = int(os.getenv('PBKDF2_ITERATIONS', 150000))
@@ -0,0 +1,14 @@
+"""Профиль тестов: DJANGO_SETTINGS_MODULE=yatube.settings_test.
+
+manage.py test и pytest включают его сами.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+# Стойкость хеша в тестах не нужна, а PBKDF2 тратит на каждый пароль
+# десятки миллисекунд.
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Фоновые потоки миниатюр пишут в MEDIA_ROOT, который тесты удаляют
+# сразу после проверки.
+POST_THUMBNAIL_ASYNC = False
@@ -1,7 +1,10 @@
+import re
+
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core.view import media_file, metrics_view, static_file
 
 urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
@@ -9,12 +12,32 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    path('metrics', metrics_view, name='metrics'),
+]
+
+
+def files_url(prefix):
+    return r'^{}(?P<path>.+)$'.format(re.escape(prefix.lstrip('/')))
+
+
+urlpatterns += [
+    re_path(
+        files_url(settings.MEDIA_URL),
+        media_file,
+        name='media'
+    ),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )
+# При DEBUG статику из приложений раздаёт runserver, без collectstatic.
+if not settings.DEBUG:
+    urlpatterns += [
+        re_path(
+            files_url(settings.STATIC_URL),
+            static_file,
+            name='static'
+        ),
+    ]
 
 handler404 = 'core.view.page_not_found'
 handler500 = 'core.view.server_error'
@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Шаблоны разбираются до первого запроса; с gunicorn --preload один раз
+# в мастер-процессе, и воркеры получают их готовыми.
+if settings.TEMPLATE_WARMUP:
+    from core.template_backends import warm_up
+    warm_up()